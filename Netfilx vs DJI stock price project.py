@@ -34,9 +34,16 @@
 # - `import seaborn as sns`
 
 # %%
-from matplotlib import pyplot as plt
+#pyplot and seaborn are imported right before the first chart (step 5),
+#so running only the data cells doesn't pay for loading them
 import pandas as pd
-import seaborn as sns
+
+#opt-in timing of the stages below, see stage_timer.py
+from stage_timer import stage
+
+#the charts are drawn here and written to their files by worker threads, see figure_output.py
+from figure_output import FigureOutput
+output = FigureOutput(dpi=100,layout_cache='figure_layout.json')
 
 
 # %% [markdown]
@@ -53,7 +60,8 @@ import seaborn as sns
 # Note: In the Yahoo Data, `Adj Close` represents the adjusted close price adjusted for both dividends and splits. This means this is the true closing stock price for a given business day.
 
 # %%
-netflix = pd.read_csv('NFLX.csv')
+with stage('load_netflix'):
+    netflix = pd.read_csv('NFLX.csv')
 netflix.head()
 
 # %% [markdown]
@@ -63,7 +71,8 @@ netflix.head()
 # 
 
 # %%
-dji = pd.read_csv('DJI.csv')
+with stage('load_dji'):
+    dji = pd.read_csv('DJI.csv')
 dji.head()
 
 # %% [markdown]
@@ -71,7 +80,8 @@ dji.head()
 # 
 
 # %%
-netflix_daily_quarter = pd.read_csv('NFLX_daily_by_quarter.csv')
+with stage('load_daily_quarter'):
+    netflix_daily_quarter = pd.read_csv('NFLX_daily_by_quarter.csv')
 netflix_daily_quarter.head()
 
 # %% [markdown]
@@ -122,7 +132,8 @@ netflix.head()
 # 
 
 # %%
-netflix.rename(columns={'Adj Close':'Price'},inplace=True)
+with stage('rename_columns'):
+    netflix.rename(columns={'Adj Close':'Price'},inplace=True)
 
 # %% [markdown]
 # Run `netflix_stocks.head()` again to check your column name has changed.
@@ -137,8 +148,15 @@ netflix.head()
 #dji.head()
 #netflix_daily_quarter.head()
 
-dji.rename(columns={'Adj Close':'Price'},inplace=True)
-netflix_daily_quarter.rename(columns={'Adj Close':'Price'},inplace=True)
+with stage('rename_columns'):
+    dji.rename(columns={'Adj Close':'Price'},inplace=True)
+    netflix_daily_quarter.rename(columns={'Adj Close':'Price'},inplace=True)
+
+#parse the dates so the line charts get a real date axis instead of one category per date string
+with stage('parse_dates'):
+    netflix['Date'] = pd.to_datetime(netflix['Date'])
+    dji['Date'] = pd.to_datetime(dji['Date'])
+    netflix_daily_quarter['Date'] = pd.to_datetime(netflix_daily_quarter['Date'])
 
 # %%
 netflix_daily_quarter.head()
@@ -163,26 +181,33 @@ netflix_daily_quarter.head()
 # 
 
 # %%
-plt.figure(figsize=(15,10))
-ax = sns.violinplot(data=netflix_daily_quarter,x='Quarter',y='Price')
-ax = sns.set_palette('pastel')
-ax = sns.set_context('poster')
-ax = sns.set_style('whitegrid')
-ax = plt.ylabel('Closing Stock Price')
-ax = plt.xlabel('Business Quarters in 2017')
-ax = plt.title('Distribution of 2017 Netflix Stock Prices by Quarter')
-plt.savefig('violinquarter.png')
+from matplotlib import pyplot as plt
+import seaborn as sns
+
+with stage('violin_quarter'):
+    plt.figure(figsize=(15,10))
+    ax = sns.violinplot(data=netflix_daily_quarter,x='Quarter',y='Price')
+    ax = sns.set_palette('pastel')
+    ax = sns.set_context('poster')
+    ax = sns.set_style('whitegrid')
+    ax = plt.ylabel('Closing Stock Price')
+    ax = plt.xlabel('Business Quarters in 2017')
+    ax = plt.title('Distribution of 2017 Netflix Stock Prices by Quarter')
+with stage('savefig_violinquarter'):
+    output.save(plt.gcf(),'violinquarter.png')
 plt.show()
 
 # %%
-plt.figure(figsize=(15,10))
-sns.kdeplot(netflix_daily_quarter['Price'][netflix_daily_quarter['Quarter'] == 'Q1'],shade=True)
-sns.kdeplot(netflix_daily_quarter['Price'][netflix_daily_quarter['Quarter'] == 'Q2'],shade=True)
-sns.kdeplot(netflix_daily_quarter['Price'][netflix_daily_quarter['Quarter'] == 'Q3'],shade=True)
-sns.kdeplot(netflix_daily_quarter['Price'][netflix_daily_quarter['Quarter'] == 'Q4'],shade=True)
-plt.title('Distribution of 2017 Netflix Stock Prices by Quarter')
-plt.legend(netflix_daily_quarter['Quarter'].unique())
-plt.savefig('kdequarter.png')
+with stage('kde_quarter'):
+    plt.figure(figsize=(15,10))
+    sns.kdeplot(netflix_daily_quarter['Price'][netflix_daily_quarter['Quarter'] == 'Q1'],shade=True)
+    sns.kdeplot(netflix_daily_quarter['Price'][netflix_daily_quarter['Quarter'] == 'Q2'],shade=True)
+    sns.kdeplot(netflix_daily_quarter['Price'][netflix_daily_quarter['Quarter'] == 'Q3'],shade=True)
+    sns.kdeplot(netflix_daily_quarter['Price'][netflix_daily_quarter['Quarter'] == 'Q4'],shade=True)
+    plt.title('Distribution of 2017 Netflix Stock Prices by Quarter')
+    plt.legend(netflix_daily_quarter['Quarter'].unique())
+with stage('savefig_kdequarter'):
+    output.save(plt.gcf(),'kdequarter.png')
 plt.show()
 
 # %% [markdown]
@@ -229,17 +254,19 @@ plt.show()
 # 
 
 # %%
-x_positions = [1, 2, 3, 4]
-chart_labels = ["1Q2017","2Q2017","3Q2017","4Q2017"]
-earnings_actual =[.4, .15,.29,.41]
-earnings_estimate = [.37,.15,.32,.41 ]
-sns.set()
-plt.scatter(x_positions,earnings_actual,color='red',alpha=0.5)
-plt.scatter(x_positions,earnings_estimate, color='blue',alpha=0.5)
-plt.legend(['Actual','Estimate'])
-plt.xticks(x_positions,chart_labels)
-plt.title('Earnings Per Share in Cents')
-plt.savefig('scatterearnings.png')
+with stage('scatter_earnings'):
+    x_positions = [1, 2, 3, 4]
+    chart_labels = ["1Q2017","2Q2017","3Q2017","4Q2017"]
+    earnings_actual =[.4, .15,.29,.41]
+    earnings_estimate = [.37,.15,.32,.41 ]
+    sns.set()
+    plt.scatter(x_positions,earnings_actual,color='red',alpha=0.5)
+    plt.scatter(x_positions,earnings_estimate, color='blue',alpha=0.5)
+    plt.legend(['Actual','Estimate'])
+    plt.xticks(x_positions,chart_labels)
+    plt.title('Earnings Per Share in Cents')
+with stage('savefig_scatterearnings'):
+    output.save(plt.gcf(),'scatterearnings.png')
 plt.show()
 
 
@@ -276,38 +303,40 @@ plt.show()
 
 # %%
 # The metrics below are in billions of dollars
-revenue_by_quarter = [2.79, 2.98,3.29,3.7]
-earnings_by_quarter = [.0656,.12959,.18552,.29012]
-quarter_labels = ["2Q2017","3Q2017","4Q2017", "1Q2018"]
-
-# Revenue
-n = 1  # This is our first dataset (out of 2)
-t = 2 # Number of dataset
-d = 4 # Number of sets of bars
-w = .5 # Width of each bar
-bars1_x = [t*element + w*n for element
-             in range(d)]
-
-sns.set()
-plt.figure(figsize=(10,10))
-plt.bar(bars1_x,revenue_by_quarter)
-
-# Earnings
-n = 2  # This is our second dataset (out of 2)
-t = 2 # Number of dataset
-d = 4 # Number of sets of bars
-w = .5 # Width of each bar
-bars2_x = [t*element + w*n for element
-             in range(d)]
-
-plt.bar(bars2_x,earnings_by_quarter)
-
-middle_x = [ (a + b) / 2.0 for a, b in zip(bars1_x, bars2_x)]
-labels = ["Revenue", "Earnings"]
-plt.legend(labels)
-plt.xticks(middle_x,quarter_labels)
-plt.title('Revenue and Earnings')
-plt.savefig('earningsrevenue.png')
+with stage('barplot_earnings_revenue'):
+    revenue_by_quarter = [2.79, 2.98,3.29,3.7]
+    earnings_by_quarter = [.0656,.12959,.18552,.29012]
+    quarter_labels = ["2Q2017","3Q2017","4Q2017", "1Q2018"]
+
+    # Revenue
+    n = 1  # This is our first dataset (out of 2)
+    t = 2 # Number of dataset
+    d = 4 # Number of sets of bars
+    w = .5 # Width of each bar
+    bars1_x = [t*element + w*n for element
+                 in range(d)]
+
+    sns.set()
+    plt.figure(figsize=(10,10))
+    plt.bar(bars1_x,revenue_by_quarter)
+
+    # Earnings
+    n = 2  # This is our second dataset (out of 2)
+    t = 2 # Number of dataset
+    d = 4 # Number of sets of bars
+    w = .5 # Width of each bar
+    bars2_x = [t*element + w*n for element
+                 in range(d)]
+
+    plt.bar(bars2_x,earnings_by_quarter)
+
+    middle_x = [ (a + b) / 2.0 for a, b in zip(bars1_x, bars2_x)]
+    labels = ["Revenue", "Earnings"]
+    plt.legend(labels)
+    plt.xticks(middle_x,quarter_labels)
+    plt.title('Revenue and Earnings')
+with stage('savefig_earningsrevenue'):
+    output.save(plt.gcf(),'earningsrevenue.png')
 plt.show()
 
 # %% [markdown]
@@ -335,25 +364,31 @@ plt.show()
 # - Roughly, what percentage of the revenue constitutes earnings?
 
 # %%
-percentage = []
-for i in range(len(earnings_by_quarter)):
-    percentage.append(((earnings_by_quarter[i] / revenue_by_quarter[i]) * 100))
+with stage('percent_earnings'):
+    percentage = []
+    for i in range(len(earnings_by_quarter)):
+        percentage.append(((earnings_by_quarter[i] / revenue_by_quarter[i]) * 100))
 
 print(percentage)
 
 # %%
-sns.set()
-
-plt.figure(figsize=(10,10))
-ax = plt.subplot()
-plt.bar(range(len(percentage)),percentage)
-ax.set_xticks(range(len(percentage)))
-ax.set_xticklabels(quarter_labels)
-plt.title('Earnings in Percentage of Revenue per Quarter')
-plt.ylabel('Percent')
-ax.yaxis.set_major_formatter(mtick.PercentFormatter(decimals=0)) 
-plt.xlabel('Quarter')
-plt.savefig('percentearnings.png')
+#import module to change format of values
+import matplotlib.ticker as mtick
+
+with stage('barplot_percent_earnings'):
+    sns.set()
+
+    plt.figure(figsize=(10,10))
+    ax = plt.subplot()
+    plt.bar(range(len(percentage)),percentage)
+    ax.set_xticks(range(len(percentage)))
+    ax.set_xticklabels(quarter_labels)
+    plt.title('Earnings in Percentage of Revenue per Quarter')
+    plt.ylabel('Percent')
+    ax.yaxis.set_major_formatter(mtick.PercentFormatter(decimals=0)) 
+    plt.xlabel('Quarter')
+with stage('savefig_percentearnings'):
+    output.save(plt.gcf(),'percentearnings.png')
 plt.show()
 
 # %% [markdown]
@@ -377,61 +412,63 @@ plt.show()
 # 
 
 # %%
+#module to let matplotlib pick the date ticks for any span of dates
+import matplotlib.dates as mdates
+
 # Left plot Netflix
-sns.set()
-ax1 = plt.subplot(1,2,1)
-ax1 = sns.lineplot(data=netflix,x='Date',y='Price')
-ax1.set_xticklabels(['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec'])
-plt.title('Netflix')
-plt.xticks(rotation=60)
-plt.xlabel('Date')
-plt.ylabel('Stock Price')
-
-# Right plot Dow Jones
-ax2 = plt.subplot(1,2,2)
-ax2 = sns.lineplot(data=dji,x='Date',y='Price')
-plt.title('Dow Jones')
-plt.xlabel('Date')
-ax2.set_xticklabels(['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec'])
-plt.ylabel('Stock Price')
-plt.subplots_adjust(wspace=0.5)
-plt.xticks(rotation=60)
-plt.savefig('stockgrowth.png')
+with stage('lineplot_stock_growth'):
+    sns.set()
+    ax1 = plt.subplot(1,2,1)
+    ax1.plot(netflix.Date,netflix.Price)
+    ax1.xaxis.set_major_locator(mdates.AutoDateLocator())
+    ax1.xaxis.set_major_formatter(mdates.ConciseDateFormatter(ax1.xaxis.get_major_locator()))
+    plt.title('Netflix')
+    plt.xlabel('Date')
+    plt.ylabel('Stock Price')
+
+    # Right plot Dow Jones
+    ax2 = plt.subplot(1,2,2)
+    ax2.plot(dji.Date,dji.Price)
+    ax2.xaxis.set_major_locator(mdates.AutoDateLocator())
+    ax2.xaxis.set_major_formatter(mdates.ConciseDateFormatter(ax2.xaxis.get_major_locator()))
+    plt.title('Dow Jones')
+    plt.xlabel('Date')
+    plt.ylabel('Stock Price')
+    plt.subplots_adjust(wspace=0.5)
+with stage('savefig_stockgrowth'):
+    output.save(plt.gcf(),'stockgrowth.png')
 plt.show()
 
 # %%
 #create percentage growth of each dataset to compare easier
-grow_percentage_dji = []
-for i in range(len(dji)):
-    grow_percentage_dji.append((dji.Price[i] / dji.Price[0]) * 100)
-
-grow_percentage_netflix = []
-for i in range(len(netflix)):
-    grow_percentage_netflix.append((netflix.Price[i] / netflix.Price[0]) * 100)
-
-# %%
-#import module to change format of values
-
-import matplotlib.ticker as mtick
-
+with stage('grow_percentage'):
+    grow_percentage_dji = []
+    for i in range(len(dji)):
+        grow_percentage_dji.append((dji.Price[i] / dji.Price[0]) * 100)
 
+    grow_percentage_netflix = []
+    for i in range(len(netflix)):
+        grow_percentage_netflix.append((netflix.Price[i] / netflix.Price[0]) * 100)
 
 # %%
-sns.set()
-plt.figure(figsize=(10,8))
-sns.set_palette('pastel')
-sns.set_context('poster')
-sns.set_style('white')
-ax = sns.lineplot(x=dji.Date,y=grow_percentage_dji)
-ax.yaxis.set_major_formatter(mtick.PercentFormatter(decimals=0)) 
-sns.lineplot(x=dji.Date,y=grow_percentage_netflix)
-ax.set_xticklabels(['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec'])
-plt.legend(['dji','netflix'])
-plt.xticks(rotation=60)
-plt.title('Percentage growth of stock prices')
-plt.ylabel('Percentage of Original')
-sns.despine()
-plt.savefig('percentage_growth.png')
+with stage('lineplot_percentage_growth'):
+    sns.set()
+    plt.figure(figsize=(10,8))
+    sns.set_palette('pastel')
+    sns.set_context('poster')
+    sns.set_style('white')
+    ax = plt.subplot()
+    ax.plot(dji.Date,grow_percentage_dji)
+    ax.yaxis.set_major_formatter(mtick.PercentFormatter(decimals=0)) 
+    ax.plot(netflix.Date,grow_percentage_netflix)
+    ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(ax.xaxis.get_major_locator()))
+    plt.legend(['dji','netflix'])
+    plt.title('Percentage growth of stock prices')
+    plt.ylabel('Percentage of Original')
+    sns.despine()
+with stage('savefig_percentage_growth'):
+    output.save(plt.gcf(),'percentage_growth.png')
 plt.show()
 
 # %% [markdown]
@@ -450,6 +487,10 @@ plt.show()
 # hard to say without calculating
 # letsssgoo we calculated it and it looks like
 
+# %%
+#wait until every chart is written, and show the size of each file and how long it took
+output.print_report()
+
 # %% [markdown]
 # # Step 9
 # 
@@ -0,0 +1,313 @@
+"""Write matplotlib figures to files faster, with the format and compression chosen per figure.
+
+`plt.savefig('chart.png')` draws the figure and then encodes the PNG at zlib's
+default level on the main thread, and with bbox_inches='tight' it first works
+out where every artist ends up. FigureOutput splits this up:
+
+    output = FigureOutput(dpi=100, layout_cache='figure_layout.json')
+    output.save(plt.gcf(), '11-gdp_per_country.png', tight=True)
+    ...
+    output.close()          # waits until every file is written
+    output.print_report()   # bytes and time per figure
+
+save() draws the figure once on the Agg canvas and copies the pixels. The
+pixels are encoded into the file by a thread pool (Pillow lets go of the GIL
+while it compresses), so the script can go on with the next chart. The format
+is picked from the file name, or per figure with `format=`:
+
+    png    compress_level 0-9; the default 1 gives slightly bigger files in a
+           fraction of the time of matplotlib's 6
+    webp   lossy with `quality`, or lossless
+    svg    the raster image inside an svg file
+
+Every figure is written at the same fixed `dpi`. With tight=True the image is
+cropped to the tight bounding box of the figure. The box is worked out once
+per chart and kept in `layout_cache`, so later runs don't lay the figure out
+again. It is kept together with the size of the figure, the padding and a
+fingerprint of its layout: its texts and where its axes and legends are. The
+box is measured again when any of these changed, like when new data gives
+other tick labels or legend entries, or subplots_adjust moved the axes. A box that
+reaches outside the figure can't be cropped from the pixels, so that figure
+is drawn a second time by savefig with the cached box, into memory; its pixels
+go to the thread pool like the others. The report marks these figures.
+
+Run this file for a benchmark against plain savefig:
+
+    python figure_output.py --figures 10
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+FORMATS = {'png': '.png', 'webp': '.webp', 'svg': '.svg'}
+
+SVG_TEMPLATE = ('<svg xmlns="http://www.w3.org/2000/svg" width="{width}pt" height="{height}pt" '
+                'viewBox="0 0 {pixel_width} {pixel_height}">'
+                '<image width="{pixel_width}" height="{pixel_height}" href="data:image/png;base64,{data}"/></svg>\n')
+
+
+def layout_fingerprint(figure):
+    """A hash of what decides the tight box of a drawn figure.
+
+    That is every visible text with its font size and rotation, the position
+    of every axes and where every legend was drawn.
+    """
+    from matplotlib.legend import Legend
+    from matplotlib.text import Text
+
+    parts = ['{}|{}|{}'.format(text.get_text(), text.get_fontsize(), text.get_rotation())
+             for text in figure.findobj(Text) if text.get_visible() and text.get_text()]
+    parts += ['axes|{:.4f}|{:.4f}|{:.4f}|{:.4f}'.format(*ax.get_position().bounds) for ax in figure.axes]
+    parts += ['legend|{:.1f}|{:.1f}|{:.1f}|{:.1f}'.format(*legend.get_window_extent().bounds)
+              for legend in figure.findobj(Legend) if legend.get_visible()]
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class FigureOutput:
+    """Draws figures on the calling thread and encodes them into files on a thread pool."""
+
+    def __init__(self, dpi=100, format=None, compress_level=1, quality=90, lossless=False, workers=None,
+                 layout_cache=None, pad_inches=0.1):
+        self.dpi = dpi
+        self.format = format
+        self.compress_level = compress_level
+        self.quality = quality
+        self.lossless = lossless
+        self.layout_cache = layout_cache
+        self.pad_inches = pad_inches
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._pending = []
+        self.records = []
+        self._layouts = {}
+        self._layouts_changed = False
+        if layout_cache and os.path.exists(layout_cache):
+            with open(layout_cache) as f:
+                self._layouts = json.load(f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def save(self, figure, path, format=None, tight=False, layout=None):
+        """Draw `figure` and queue it to be written to `path`; returns the path that will be written.
+
+        A `format` other than the extension of `path` replaces the extension.
+        The figure is drawn at the dpi of this output, on a temporary Agg
+        canvas when its own canvas can't give pixels; afterwards it has its
+        own dpi and canvas again, so plt.show() still works. The tight box is
+        cached under `layout`, by default the file name without extension.
+        """
+        import numpy as np
+
+        start = time.perf_counter()
+        root, extension = os.path.splitext(path)
+        format = (format or self.format or extension.lstrip('.') or 'png').lower()
+        if format not in FORMATS:
+            raise ValueError('unknown figure format {!r}, use one of {}'.format(format, ', '.join(FORMATS)))
+        path = root + FORMATS[format]
+
+        dpi, canvas = figure.dpi, figure.canvas
+        if not hasattr(canvas, 'buffer_rgba'):
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            FigureCanvasAgg(figure)
+        figure.set_dpi(self.dpi)
+        try:
+            figure.canvas.draw()
+            pixels = np.asarray(figure.canvas.buffer_rgba())
+
+            redrawn = False
+            if tight:
+                x0, y0, x1, y1 = self._tight_box(figure, layout or os.path.basename(root))
+                width, height = figure.get_size_inches()
+                if x0 < 0 or y0 < 0 or x1 > width or y1 > height:
+                    #the box sticks out of the figure: let matplotlib draw it again at that size
+                    redrawn = True
+                    pixels = self._draw_box(figure, (x0, y0, x1, y1))
+                else:
+                    #pixel rows count from the top, inches from the bottom
+                    pixels = pixels[round((height - y1) * self.dpi):round((height - y0) * self.dpi),
+                                    round(x0 * self.dpi):round(x1 * self.dpi)]
+            #the canvas is reused by the next chart, so the encoder gets its own copy
+            pixels = pixels.copy()
+        finally:
+            figure.set_dpi(dpi)
+            figure.set_canvas(canvas)
+        draw_s = time.perf_counter() - start
+        self._pending.append((path, format, draw_s, redrawn, self._pool.submit(self._encode, pixels, path, format)))
+        return path
+
+    def _tight_box(self, figure, name):
+        """The padded tight bounding box of `figure` in inches, from the cache when it was seen before.
+
+        The box depends on the size of the figure, on `pad_inches` and on its
+        layout (see layout_fingerprint), so a cached box is only used when all
+        of them are the same as when it was measured.
+        """
+        size = [round(float(inches), 3) for inches in figure.get_size_inches()]
+        fingerprint = layout_fingerprint(figure)
+        cached = self._layouts.get(name)
+        if (cached and cached['size'] == size and cached.get('pad_inches') == self.pad_inches
+                and cached.get('fingerprint') == fingerprint):
+            return cached['box']
+        box = figure.get_tightbbox(figure.canvas.get_renderer()).padded(self.pad_inches)
+        self._layouts[name] = {'size': size, 'pad_inches': self.pad_inches, 'fingerprint': fingerprint,
+                               'box': [box.x0, box.y0, box.x1, box.y1]}
+        self._layouts_changed = True
+        return self._layouts[name]['box']
+
+    def _draw_box(self, figure, box):
+        """The pixels of `box` (in inches) drawn by savefig, for a box that reaches outside the figure.
+
+        savefig writes an uncompressed png into memory, which is read back so
+        the file itself is encoded by _encode with the settings of this output.
+        """
+        import numpy as np
+        from matplotlib.transforms import Bbox
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format='png', dpi=self.dpi, bbox_inches=Bbox.from_extents(*box), pad_inches=0,
+                       pil_kwargs={'compress_level': 0})
+        buffer.seek(0)
+        return np.asarray(Image.open(buffer).convert('RGBA'))
+
+    def _encode(self, pixels, path, format):
+        from PIL import Image
+
+        start = time.perf_counter()
+        image = Image.fromarray(pixels)
+        #figures are usually opaque; leaving out the alpha channel makes smaller files faster
+        if pixels[..., 3].min() == 255:
+            image = image.convert('RGB')
+        if format == 'webp':
+            image.save(path, 'webp', quality=self.quality, lossless=self.lossless)
+        elif format == 'svg':
+            png = io.BytesIO()
+            image.save(png, 'png', compress_level=self.compress_level)
+            height, width = pixels.shape[:2]
+            with open(path, 'w') as f:
+                f.write(SVG_TEMPLATE.format(width=width * 72 / self.dpi, height=height * 72 / self.dpi,
+                                            pixel_width=width, pixel_height=height,
+                                            data=base64.b64encode(png.getvalue()).decode('ascii')))
+        else:
+            image.save(path, 'png', compress_level=self.compress_level)
+        return os.path.getsize(path), time.perf_counter() - start
+
+    def wait(self):
+        """Block until every queued figure is written, and return the records of all figures so far."""
+        pending, self._pending = self._pending, []
+        for path, format, draw_s, redrawn, future in pending:
+            size, encode_s = future.result()
+            self.records.append({'path': path, 'format': format, 'bytes': size, 'draw_s': draw_s,
+                                 'encode_s': encode_s, 'redrawn': redrawn})
+        if self._layouts_changed and self.layout_cache:
+            with open(self.layout_cache, 'w') as f:
+                json.dump(self._layouts, f, indent=1)
+            self._layouts_changed = False
+        return self.records
+
+    def close(self):
+        self.wait()
+        self._pool.shutdown()
+
+    def report(self):
+        """One line per written figure: bytes, time to draw and time to encode.
+
+        Figures whose tight box reached outside the figure were drawn twice
+        and are marked with a *.
+        """
+        lines = ['{:<40} {:>6} {:>10} {:>9} {:>10}'.format('figure', 'format', 'bytes', 'draw ms', 'encode ms')]
+        for record in self.records:
+            lines.append('{:<40} {:>6} {:>10} {:>9.1f} {:>10.1f}'.format(
+                os.path.basename(record['path']) + (' *' if record['redrawn'] else ''), record['format'],
+                record['bytes'],
+                record['draw_s'] * 1000, record['encode_s'] * 1000))
+        return '\n'.join(lines)
+
+    def print_report(self):
+        self.wait()
+        print(self.report())
+
+
+def sample_figure(seed):
+    """A chart like '11-gdp_per_country.png': grouped bars with a legend and a title."""
+    import numpy as np
+    from matplotlib.figure import Figure
+
+    rng = np.random.default_rng(seed)
+    figure = Figure(figsize=(15, 10))
+    figure.suptitle('GDP per country', fontsize=20)
+    ax = figure.add_subplot(1, 1, 1)
+    years = range(2000, 2016)
+    for i, year in enumerate(years):
+        ax.bar(np.arange(6) + i * 0.05, rng.random(6) * 10, width=0.05, label=str(year))
+    ax.set_xticks(np.arange(6) + 0.4)
+    ax.set_xticklabels(['Chile', 'China', 'Germany', 'Mexico', 'United States of America', 'Zimbabwe'], rotation=15)
+    ax.set_ylabel('GDP in Trillion USD')
+    ax.legend(bbox_to_anchor=(1.0, 1), loc='upper left')
+    return figure
+
+
+def benchmark(figures=10, out_dir='figure_benchmark', workers=None):
+    """Write `figures` sample charts with plain savefig and with FigureOutput, return {setup: stats}."""
+    os.makedirs(out_dir, exist_ok=True)
+    samples = [sample_figure(seed) for seed in range(figures)]
+    results = {}
+
+    for name, options in [('savefig', {}), ('savefig tight', {'bbox_inches': 'tight'})]:
+        start = time.perf_counter()
+        paths = []
+        for i, figure in enumerate(samples):
+            path = os.path.join(out_dir, '{}-{}.png'.format(name.replace(' ', '_'), i))
+            figure.savefig(path, dpi=100, **options)
+            paths.append(path)
+        elapsed = time.perf_counter() - start
+        results[name] = {'ms_per_figure': elapsed / figures * 1000,
+                         'bytes_per_figure': sum(os.path.getsize(path) for path in paths) / figures}
+
+    for name, format, options in [('png level 1 tight', 'png', {}), ('png level 6 tight', 'png', {'compress_level': 6}),
+                                  ('webp tight', 'webp', {}), ('svg tight', 'svg', {})]:
+        layout_cache = os.path.join(out_dir, 'layout.json')
+        if os.path.exists(layout_cache):
+            os.remove(layout_cache)
+        start = time.perf_counter()
+        with FigureOutput(dpi=100, workers=workers, layout_cache=layout_cache, **options) as output:
+            for i, figure in enumerate(samples):
+                #one layout name for all, like one chart redrawn with new data: the box is
+                #measured again only when the texts of the chart changed
+                output.save(figure, os.path.join(out_dir, '{}-{}.png'.format(name.replace(' ', '_'), i)),
+                            format=format, tight=True, layout='sample')
+            output.wait()
+        elapsed = time.perf_counter() - start
+        records = output.records
+        results[name] = {'ms_per_figure': elapsed / figures * 1000,
+                         'bytes_per_figure': sum(record['bytes'] for record in records) / figures,
+                         'draw_ms': sum(record['draw_s'] for record in records) / figures * 1000,
+                         'encode_ms': sum(record['encode_s'] for record in records) / figures * 1000}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare plain savefig with FigureOutput.')
+    parser.add_argument('--figures', type=int, default=10, help='number of sample charts')
+    parser.add_argument('--out-dir', default='figure_benchmark', help='folder to write the charts to')
+    parser.add_argument('--workers', type=int, default=None, help='number of encoder threads')
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+    for name, stats in benchmark(args.figures, args.out_dir, args.workers).items():
+        print('{:<18} '.format(name) + '  '.join('{} {:.1f}'.format(key, value) for key, value in stats.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Audio tour catalog for the paintings of 505-frida_project.
+
+In the notebook `paintings` ends up as a mix of (title, year) tuples and
+one-key {title: year} dicts, and `master_list` zips it with the tour numbers,
+so finding a painting by tour number, title or year means walking the whole
+list. PaintingCatalog stores the same data column by column:
+
+    catalog = PaintingCatalog.from_paintings(paintings)
+    catalog.by_tour(5)              # Painting(5, 'The Broken Column', 1944)
+    catalog.by_title('Tree of Hope')
+    catalog.between(1939, 1944)     # paintings from 1939 up to and including 1944
+
+Tour numbers are handed out in the order paintings are added, starting at 1
+like `audio_tour_number` in the notebook, so adding a batch never renumbers or
+rebuilds what is already there.
+"""
+
+import bisect
+import heapq
+from array import array
+
+
+class Painting:
+    """One stop of the audio tour."""
+
+    __slots__ = ('tour_number', 'title', 'year')
+
+    def __init__(self, tour_number, title, year):
+        self.tour_number = tour_number
+        self.title = title
+        self.year = year
+
+    def __repr__(self):
+        return 'Painting({!r}, {!r}, {!r})'.format(self.tour_number, self.title, self.year)
+
+    def __eq__(self, other):
+        if not isinstance(other, Painting):
+            return NotImplemented
+        return (self.tour_number, self.title, self.year) == (other.tour_number, other.title, other.year)
+
+    def __hash__(self):
+        return hash((self.tour_number, self.title, self.year))
+
+
+def painting_entries(entry):
+    """The (title, year) pairs in one entry of the notebook's `paintings` list.
+
+    Entries are either a (title, year) tuple or a {title: year} dict.
+    """
+    if isinstance(entry, dict):
+        return list(entry.items())
+    title, year = entry
+    return [(title, year)]
+
+
+class PaintingCatalog:
+    """Paintings stored column by column, with lookups by tour number, title and year.
+
+    Titles and years live in a list and an array indexed by tour number - 1.
+    A dict maps every title to its tour number; when a title appears more than
+    once, by_title() returns the first one. For year ranges the tour numbers
+    are kept sorted by year. New paintings are only merged into that order the
+    next time a year query needs it, so adding them stays cheap.
+    """
+
+    def __init__(self):
+        self._titles = []
+        self._years = array('l')
+        self._tour_by_title = {}
+        self._year_order = array('l')
+        self._year_order_years = array('l')
+
+    @classmethod
+    def from_paintings(cls, paintings):
+        """Build a catalog from the notebook's mixed `paintings` list."""
+        catalog = cls()
+        catalog.extend(pair for entry in paintings for pair in painting_entries(entry))
+        return catalog
+
+    @classmethod
+    def from_master_list(cls, master_list):
+        """Build a catalog from `master_list`, the (tour number, painting) pairs of the notebook."""
+        catalog = cls()
+        for tour_number, entry in sorted(master_list, key=lambda item: item[0]):
+            for title, year in painting_entries(entry):
+                if catalog.add(title, year) != tour_number:
+                    raise ValueError('tour numbers in master_list must run 1, 2, 3, ... without gaps')
+        return catalog
+
+    def add(self, title, year):
+        """Add one painting and return its tour number."""
+        self._titles.append(title)
+        self._years.append(year)
+        tour_number = len(self._titles)
+        self._tour_by_title.setdefault(title, tour_number)
+        return tour_number
+
+    def extend(self, paintings):
+        """Add (title, year) pairs in bulk and return the range of tour numbers they got."""
+        first = len(self._titles) + 1
+        for title, year in paintings:
+            self.add(title, year)
+        return range(first, len(self._titles) + 1)
+
+    def __len__(self):
+        return len(self._titles)
+
+    def __iter__(self):
+        for index in range(len(self._titles)):
+            yield Painting(index + 1, self._titles[index], self._years[index])
+
+    def __contains__(self, title):
+        return title in self._tour_by_title
+
+    def by_tour(self, tour_number):
+        """The painting at stop `tour_number`, raises KeyError when there is no such stop."""
+        if not 1 <= tour_number <= len(self._titles):
+            raise KeyError(tour_number)
+        return Painting(tour_number, self._titles[tour_number - 1], self._years[tour_number - 1])
+
+    def by_title(self, title):
+        """The painting called `title`, raises KeyError when it is not in the catalog."""
+        return self.by_tour(self._tour_by_title[title])
+
+    def _sort_new_years(self):
+        #merge the paintings added since the last year query into the sorted order,
+        #those are the tour numbers after the ones already in it
+        new_tours = range(len(self._year_order) + 1, len(self._titles) + 1)
+        new = sorted(new_tours, key=lambda tour: (self._years[tour - 1], tour))
+        merged = heapq.merge(
+            zip(self._year_order_years, self._year_order),
+            ((self._years[tour - 1], tour) for tour in new),
+        )
+        order = array('l')
+        years = array('l')
+        for year, tour in merged:
+            years.append(year)
+            order.append(tour)
+        self._year_order = order
+        self._year_order_years = years
+
+    def between(self, first_year, last_year):
+        """All paintings from `first_year` up to and including `last_year`, oldest first."""
+        if len(self._year_order) < len(self._titles):
+            self._sort_new_years()
+        start = bisect.bisect_left(self._year_order_years, first_year)
+        stop = bisect.bisect_right(self._year_order_years, last_year)
+        return [self.by_tour(tour) for tour in self._year_order[start:stop]]
+
+    def in_year(self, year):
+        return self.between(year, year)
+
+    def master_list(self):
+        """The catalog in the notebook's `master_list` layout: [(tour number, (title, year)), ...]."""
+        return [(painting.tour_number, (painting.title, painting.year)) for painting in self]
@@ -0,0 +1,263 @@
+"""Search the painting titles of a PaintingCatalog as a visitor types.
+
+    catalog = PaintingCatalog.from_paintings(paintings)
+    titles = TitleSearch(catalog)
+    titles.search('Two Fri')     # [Painting(1, 'The Two Fridas', 1939)]
+    titles.search('Brokn Colum') # typo, found by the fuzzy layer
+
+Prefix search uses a sorted array holding every title from each of its word
+starts ('the two fridas', 'two fridas', 'fridas'), so 'Two Fri' finds 'The Two
+Fridas'. A query is one bisect plus a scan over the matches. The optional
+fuzzy layer corrects typos with a trigram index over the words of the titles.
+
+Run this file for a latency benchmark on a generated catalog:
+
+    python frida_search.py --titles 1000000
+"""
+
+import argparse
+import bisect
+import heapq
+import itertools
+import math
+import random
+import re
+import time
+from array import array
+
+from frida_catalog import PaintingCatalog
+
+
+def normalize(title):
+    """Lower case words separated by single spaces, without punctuation."""
+    return ' '.join(re.findall(r'\w+', title.casefold()))
+
+
+def trigrams(text, complete=True):
+    """The 3 letter pieces of `text`; an unfinished query gets no padding at the end."""
+    padded = '  ' + text + (' ' if complete else '')
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+#typed words shorter than this are not corrected: a letter or two says too
+#little to pick a word, and would compare against a large part of the vocabulary
+MIN_FUZZY_LENGTH = 3
+#most known words compared against one typed word, and most corrected queries tried
+MAX_CANDIDATES = 300
+MAX_CORRECTIONS = 6
+
+
+class TitleSearch:
+    """Prefix and typo tolerant search over the titles of a PaintingCatalog.
+
+    The fuzzy layer indexes the trigrams of every distinct word in the titles,
+    not of the titles themselves. A typed word that no title word starts with
+    is swapped for the closest known words, and the corrected query goes
+    through the prefix search. The vocabulary is much smaller than the catalog,
+    so this stays fast as the catalog grows.
+
+    The index covers the paintings in the catalog when it is built; call
+    update() after adding paintings to the catalog.
+    """
+
+    def __init__(self, catalog, fuzzy=True):
+        self.catalog = catalog
+        self._keys = []
+        self._tours = array('l')
+        self._indexed = 0
+        self._fuzzy = fuzzy
+        self._words = []
+        self._word_grams = []
+        self._sorted_words = []
+        self._word_ids = {}
+        self._trigram_words = {}
+        self.update()
+
+    @classmethod
+    def from_paintings(cls, paintings, fuzzy=True):
+        """Build the index straight from the notebook's `paintings` list."""
+        return cls(PaintingCatalog.from_paintings(paintings), fuzzy)
+
+    def update(self):
+        """Index the paintings added to the catalog since the last update.
+
+        Only the new entries are sorted; they are merged into the sorted
+        arrays like PaintingCatalog merges new years, so adding a few
+        paintings to a large catalog doesn't sort everything again.
+        """
+        new_entries = []
+        new_words = []
+        for tour_number in range(self._indexed + 1, len(self.catalog) + 1):
+            words = normalize(self.catalog.by_tour(tour_number).title).split(' ')
+            for i in range(len(words)):
+                new_entries.append((' '.join(words[i:]), tour_number))
+                if self._fuzzy and words[i] not in self._word_ids:
+                    self._add_word(words[i])
+                    new_words.append(words[i])
+        self._indexed = len(self.catalog)
+        if new_words:
+            new_words.sort()
+            self._sorted_words = list(heapq.merge(self._sorted_words, new_words))
+        if not new_entries:
+            return
+
+        new_entries.sort()
+        if self._keys:
+            new_entries = heapq.merge(zip(self._keys, self._tours), new_entries)
+        keys = []
+        tours = array('l')
+        for key, tour in new_entries:
+            keys.append(key)
+            tours.append(tour)
+        self._keys = keys
+        self._tours = tours
+
+    def _add_word(self, word):
+        word_id = len(self._words)
+        self._words.append(word)
+        self._word_ids[word] = word_id
+        grams = frozenset(trigrams(word))
+        self._word_grams.append(grams)
+        for gram in grams:
+            self._trigram_words.setdefault(gram, array('l')).append(word_id)
+
+    def prefix_tours(self, query, limit=10):
+        """Tour numbers of titles with a word starting at `query`, in title order."""
+        query = normalize(query)
+        if not query:
+            return []
+        found = []
+        seen = set()
+        i = bisect.bisect_left(self._keys, query)
+        while i < len(self._keys) and len(found) < limit and self._keys[i].startswith(query):
+            tour = self._tours[i]
+            if tour not in seen:
+                seen.add(tour)
+                found.append(tour)
+            i += 1
+        return found
+
+    def _is_known(self, word, partial):
+        if not partial:
+            return word in self._word_ids
+        i = bisect.bisect_left(self._sorted_words, word)
+        return i < len(self._sorted_words) and self._sorted_words[i].startswith(word)
+
+    def similar_words(self, word, partial=False, limit=3, min_score=0.5):
+        """The known words sharing the most trigrams with `word`, best first.
+
+        The score is the share of the trigrams of `word` found in the known
+        word. A `partial` word is still being typed and may match the start of
+        a longer word.
+        """
+        grams = trigrams(word, complete=not partial)
+        #a word sharing `needed` of the trigrams must have one of the
+        #len(grams) - needed + 1 rarest ones, so only those lists are read,
+        #and at most MAX_CANDIDATES words of them
+        needed = math.ceil(min_score * len(grams))
+        rarest = sorted(grams, key=lambda gram: len(self._trigram_words.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:len(grams) - needed + 1]:
+            candidates.update(self._trigram_words.get(gram, ()))
+            if len(candidates) >= MAX_CANDIDATES:
+                break
+
+        scored = []
+        for word_id in itertools.islice(candidates, MAX_CANDIDATES):
+            known = self._words[word_id]
+            score = len(grams & self._word_grams[word_id]) / len(grams)
+            if score >= min_score:
+                #on equal scores prefer the word closest in length
+                scored.append((-score, abs(len(known) - len(word)), known))
+        scored.sort()
+        return [known for score, difference, known in scored[:limit]]
+
+    def fuzzy_tours(self, query, limit=10, min_score=0.5):
+        """Tour numbers of titles matching `query` after fixing its misspelled words.
+
+        The last word is taken to be partly typed, like in prefix_tours().
+        """
+        if not self._fuzzy:
+            raise ValueError('this TitleSearch was built without the fuzzy layer')
+        words = normalize(query).split(' ')
+        if words == ['']:
+            return []
+
+        options = []
+        for i, word in enumerate(words):
+            partial = i == len(words) - 1
+            if self._is_known(word, partial) or len(word) < MIN_FUZZY_LENGTH:
+                options.append([word])
+            else:
+                options.append(self.similar_words(word, partial, min_score=min_score) or [word])
+
+        found = []
+        for corrected in itertools.islice(itertools.product(*options), MAX_CORRECTIONS):
+            found += [tour for tour in self.prefix_tours(' '.join(corrected), limit) if tour not in found]
+            if len(found) >= limit:
+                break
+        return found[:limit]
+
+    def search(self, query, limit=10):
+        """Prefix matches first, topped up with fuzzy matches when there are too few."""
+        tours = self.prefix_tours(query, limit)
+        if len(tours) < limit and self._fuzzy:
+            tours += [tour for tour in self.fuzzy_tours(query, limit) if tour not in tours][:limit - len(tours)]
+        return [self.catalog.by_tour(tour) for tour in tours]
+
+
+#the Frida titles plus made up words, to generate a catalog for the benchmark from
+FRIDA_WORDS = ('The Two Fridas My Dress Hangs Here Tree of Hope Self Portrait With Monkeys '
+               'Broken Column Wounded Deer Me and Doll').split()
+
+
+def made_up_word(rng):
+    return ''.join(rng.choice('bcdfghlmnprstvz') + rng.choice('aeiou') for _ in range(rng.randint(2, 4)))
+
+
+def benchmark(titles=1000000, queries=1000, seed=1):
+    """Build an index over `titles` generated titles and time prefix and fuzzy queries."""
+    rng = random.Random(seed)
+    words = FRIDA_WORDS + [made_up_word(rng) for _ in range(20000)]
+    catalog = PaintingCatalog()
+    catalog.extend((' '.join(rng.choice(words) for _ in range(rng.randint(2, 5))), rng.randint(1920, 1954))
+                   for i in range(titles))
+
+    start = time.perf_counter()
+    index = TitleSearch(catalog)
+    build_s = time.perf_counter() - start
+
+    def typo(text):
+        #drop one letter, like a visitor mistyping
+        i = rng.randrange(len(text))
+        return text[:i] + text[i + 1:]
+
+    #what a visitor has typed so far: the start of a title
+    typed = [catalog.by_tour(rng.randint(1, titles)).title[:rng.randint(6, 16)] for _ in range(queries)]
+    results = {'titles': titles, 'build_s': build_s}
+    for name, run, texts in [
+        ('prefix', index.prefix_tours, typed),
+        ('fuzzy', index.fuzzy_tours, [typo(text) for text in typed]),
+    ]:
+        latencies = []
+        for text in texts:
+            start = time.perf_counter()
+            run(text)
+            latencies.append((time.perf_counter() - start) * 1e6)
+        latencies.sort()
+        results[name + '_median_us'] = latencies[len(latencies) // 2]
+        results[name + '_p99_us'] = latencies[int(len(latencies) * 0.99)]
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the painting title search.')
+    parser.add_argument('--titles', type=int, default=1000000, help='number of generated titles')
+    parser.add_argument('--queries', type=int, default=1000, help='number of queries of each kind')
+    args = parser.parse_args(argv)
+    for key, value in benchmark(args.titles, args.queries).items():
+        print('{}: {}'.format(key, round(value, 1) if isinstance(value, float) else value))
+
+
+if __name__ == '__main__':
+    main()
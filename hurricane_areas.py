@@ -0,0 +1,147 @@
+"""Affected areas of the 511-dictionary-project hurricanes as integer ids.
+
+`areas_affected` in the notebook is a list of lists of strings, and
+`areacounter` counts every spelling as its own area, so 'The Bahamas' and
+'Bahamas' or 'United States East Coast' and 'United States East coast' end up
+as different keys. Here every area is normalized and stored once in an
+AreaVocabulary, and the areas of all storms live in two numpy arrays in CSR
+layout: `area_ids` holds the area ids of every storm back to back, and storm
+i owns area_ids[offsets[i]:offsets[i + 1]].
+
+    storm_areas = StormAreas.from_lists(areas_affected)
+    storm_areas.count_areas()        # {'Central America': 9, ..., 'The Bahamas': 9, ...}
+    storm_areas.most_affected()      # ('Central America', 9)
+    storm_areas.sum_by_area(deaths)  # deaths per area
+
+Counting is one np.bincount over `area_ids`.
+"""
+
+import re
+
+import numpy as np
+
+
+NOT_RECORDED = 'Damages not recorded'
+
+
+def parse_damage(damage):
+    """A damage like '27.9M' or '1.42B' in dollars, None when it was not recorded.
+
+    Numbers are passed through, so the output of the notebook's convert_dmg works as well.
+    hurricane_store uses this too.
+    """
+    if damage is None or damage == NOT_RECORDED:
+        return None
+    if isinstance(damage, (int, float)):
+        return float(damage)
+    if damage.endswith('B'):
+        return float(damage[:-1]) * 1000000000
+    if damage.endswith('M'):
+        return float(damage[:-1]) * 1000000
+    return float(damage)
+
+
+def area_key(area):
+    """The normalized form two spellings of the same area share.
+
+    Case and extra spaces don't matter and a leading 'The' is dropped, so
+    'The Bahamas' and 'bahamas ' both become 'bahamas'.
+    """
+    key = ' '.join(area.split()).casefold()
+    return re.sub(r'^the ', '', key)
+
+
+class AreaVocabulary:
+    """Every distinct area once, numbered 0, 1, 2, ... in the order they are first seen.
+
+    An area is shown with the first spelling that was seen for it.
+    """
+
+    def __init__(self):
+        self.names = []
+        self._ids = {}
+
+    def intern(self, area):
+        """The id of `area`, added to the vocabulary when it is new."""
+        key = area_key(area)
+        area_id = self._ids.get(key)
+        if area_id is None:
+            area_id = len(self.names)
+            self._ids[key] = area_id
+            self.names.append(' '.join(area.split()))
+        return area_id
+
+    def id_of(self, area):
+        """The id of `area`, raises KeyError when it is not in the vocabulary."""
+        return self._ids[area_key(area)]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, area):
+        return area_key(area) in self._ids
+
+
+class StormAreas:
+    """The affected areas of every storm as one CSR style pair of int arrays."""
+
+    def __init__(self, vocabulary, offsets, area_ids):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.area_ids = area_ids
+
+    @classmethod
+    def from_lists(cls, areas_affected, vocabulary=None):
+        """Build from the notebook's `areas_affected`, one list of area names per storm."""
+        vocabulary = vocabulary if vocabulary is not None else AreaVocabulary()
+        lengths = np.fromiter((len(areas) for areas in areas_affected), dtype=np.int64, count=len(areas_affected))
+        offsets = np.zeros(len(areas_affected) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        area_ids = np.fromiter((vocabulary.intern(area) for areas in areas_affected for area in areas),
+                               dtype=np.int32, count=int(offsets[-1]))
+        return cls(vocabulary, offsets, area_ids)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def areas_of(self, storm):
+        """The area names of storm number `storm`, in the order of `areas_affected`."""
+        ids = self.area_ids[self.offsets[storm]:self.offsets[storm + 1]]
+        return [self.vocabulary.names[area_id] for area_id in ids]
+
+    def storm_of_each_area(self):
+        """For every entry of `area_ids`, the number of the storm it belongs to."""
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    def counts(self):
+        """How often every area was hit, indexed by area id."""
+        return np.bincount(self.area_ids, minlength=len(self.vocabulary))
+
+    def count_areas(self):
+        """{area: number of hits}, the same result as `areacounter` with the spellings merged."""
+        return dict(zip(self.vocabulary.names, self.counts().tolist()))
+
+    def most_affected(self):
+        """(area, number of hits) of the area hit most often."""
+        counts = self.counts()
+        area_id = int(np.argmax(counts))
+        return self.vocabulary.names[area_id], int(counts[area_id])
+
+    def sum_by_area(self, values):
+        """Add up one value per storm (deaths, damage, ...) over the storms that hit each area.
+
+        `values` can be the notebook's `damages` as they are ('27.9M', '1.42B',
+        'Damages not recorded'), or the output of convert_dmg. Returns
+        {area: total}; unrecorded damages and NaN values are skipped.
+        """
+        values = [parse_damage(value) if isinstance(value, str) else value for value in values]
+        values = np.array([np.nan if value is None else value for value in values], dtype=float)
+        values = values[self.storm_of_each_area()]
+        weights = np.where(np.isnan(values), 0.0, values)
+        totals = np.bincount(self.area_ids, weights=weights, minlength=len(self.vocabulary))
+        return dict(zip(self.vocabulary.names, totals.tolist()))
+
+    def storms_in(self, area):
+        """The numbers of the storms that hit `area`."""
+        hits = self.area_ids == self.vocabulary.id_of(area)
+        return np.unique(self.storm_of_each_area()[hits]).tolist()
@@ -0,0 +1,255 @@
+"""The 511-dictionary-project hurricanes in a SQLite database.
+
+The notebook rebuilds `combined_list` from literal lists with `convert_dmg` and
+`combine_dicts` every time the kernel starts. This module loads those lists
+into a database file once, and answers the notebook's questions with indexed
+SQL instead of loops over every storm:
+
+    conn = connect('hurricanes.db')
+    load_hurricanes(conn, names, months, years, max_sustained_winds,
+                    areas_affected, damages, deaths)
+
+source_hash() and the meta table let the notebook tell whether the file was
+loaded from the lists it has now.
+
+    pool = ConnectionPool('hurricanes.db', size=4)
+    with pool.connection() as conn:
+        order_years(conn)          # like order_years(combined_list)
+        areacounter(conn)          # like areacounter(combined_list)
+        max_deaths(conn)           # ('Mitch', 19325)
+        mortality_ratings(conn)    # {0: [], 1: ['Cuba I', ...], ...}
+
+Areas are stored once each, with the normalized key of hurricane_areas, so
+'The Bahamas' and 'Bahamas' are the same area. Damages that were not recorded
+are stored as NULL.
+"""
+
+import hashlib
+import json
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+from hurricane_areas import NOT_RECORDED, area_key, parse_damage
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS storms (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    month TEXT,
+    year INTEGER,
+    max_sustained_wind INTEGER,
+    damage REAL,
+    deaths INTEGER
+);
+CREATE TABLE IF NOT EXISTS areas (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS storm_areas (
+    storm_id INTEGER NOT NULL REFERENCES storms(id),
+    position INTEGER NOT NULL,
+    area_id INTEGER NOT NULL REFERENCES areas(id),
+    PRIMARY KEY (storm_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS storms_year ON storms(year);
+CREATE INDEX IF NOT EXISTS storms_deaths ON storms(deaths);
+CREATE INDEX IF NOT EXISTS storms_damage ON storms(damage);
+CREATE INDEX IF NOT EXISTS storm_areas_area ON storm_areas(area_id, storm_id);
+"""
+
+#the scales of the notebook: rating -> upper bound, anything above the last bound gets the next rating
+MORTALITY_SCALE = {0: 0, 1: 100, 2: 500, 3: 1000, 4: 10000}
+DAMAGE_SCALE = {0: 0, 1: 100000000, 2: 1000000000, 3: 10000000000, 4: 50000000000}
+
+def connect(path, read_only=False):
+    """Open the database at `path` and make sure the tables exist.
+
+    WAL journaling lets readers go on while a load is writing.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    if read_only:
+        conn.execute('PRAGMA query_only=ON')
+    else:
+        conn.executescript(SCHEMA)
+    return conn
+
+
+class ConnectionPool:
+    """A fixed number of read only connections shared by threads.
+
+        with pool.connection() as conn:
+            ...
+
+    connection() blocks until one of the connections is free.
+    """
+
+    def __init__(self, path, size=4):
+        #create the tables once, so the read only connections find them
+        connect(path).close()
+        self._connections = queue.Queue()
+        for _ in range(size):
+            self._connections.put(connect(path, read_only=True))
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self._connections.get(timeout=timeout)
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+
+def source_hash(*lists):
+    """A sha1 of the lists a database was loaded from, to tell whether they changed since."""
+    return hashlib.sha1(json.dumps(lists).encode('utf-8')).hexdigest()
+
+
+def get_meta(conn, key, default=None):
+    row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return default if row is None else row[0]
+
+
+def set_meta(conn, key, value):
+    conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+
+def _area_ids(conn, areas_affected):
+    """Insert the areas that are new and return {area key: id} for all of them."""
+    names = {}
+    for areas in areas_affected:
+        for area in areas:
+            names.setdefault(area_key(area), ' '.join(area.split()))
+    conn.executemany('INSERT OR IGNORE INTO areas (key, name) VALUES (?, ?)', names.items())
+    ids = {}
+    keys = list(names)
+    #sqlite limits the number of ? in one statement, so look the keys up in chunks
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        rows = conn.execute('SELECT key, id FROM areas WHERE key IN ({})'.format(','.join('?' * len(chunk))), chunk)
+        ids.update(rows)
+    return ids
+
+
+def load_hurricanes(conn, names, months, years, max_sustained_winds, areas_affected, damages, deaths, batch_size=10000):
+    """Append the notebook's hurricane lists to the database, `batch_size` storms per transaction."""
+    for start in range(0, len(names), batch_size):
+        stop = start + batch_size
+        with conn:
+            first_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM storms').fetchone()[0]
+            batch_areas = areas_affected[start:stop]
+            area_ids = _area_ids(conn, batch_areas)
+            storm_rows = [
+                (first_id + i, name, month, year, wind, parse_damage(damage), death)
+                for i, (name, month, year, wind, damage, death) in enumerate(zip(
+                    names[start:stop], months[start:stop], years[start:stop],
+                    max_sustained_winds[start:stop], damages[start:stop], deaths[start:stop]))
+            ]
+            conn.executemany('INSERT INTO storms VALUES (?, ?, ?, ?, ?, ?, ?)', storm_rows)
+            conn.executemany(
+                'INSERT INTO storm_areas (storm_id, position, area_id) VALUES (?, ?, ?)',
+                ((first_id + i, position, area_ids[area_key(area)])
+                 for i, areas in enumerate(batch_areas)
+                 for position, area in enumerate(areas)),
+            )
+
+
+def _storm_dicts(conn, where='', parameters=(), order_by='id'):
+    """Storms as the dicts of `combined_list`, with 'Damages not recorded' for missing damages."""
+    rows = conn.execute(
+        'SELECT id, name, month, year, max_sustained_wind, damage, deaths FROM storms {} ORDER BY {}'.format(
+            where, order_by),
+        parameters).fetchall()
+    if not rows:
+        return []
+    areas = {}
+    area_rows = conn.execute(
+        'SELECT sa.storm_id, a.name FROM storm_areas sa JOIN areas a ON a.id = sa.area_id '
+        'WHERE sa.storm_id IN (SELECT id FROM storms {}) ORDER BY sa.storm_id, sa.position'.format(where),
+        parameters)
+    for storm_id, area in area_rows:
+        areas.setdefault(storm_id, []).append(area)
+    return [{'Name': name, 'Month': month, 'Year': year, 'Max Sustained Wind': wind,
+             'Areas Affected': areas.get(storm_id, []),
+             'Damage': NOT_RECORDED if damage is None else damage, 'Deaths': death}
+            for storm_id, name, month, year, wind, damage, death in rows]
+
+
+def storms_in_year(conn, year):
+    return _storm_dicts(conn, 'WHERE year = ?', (year,))
+
+
+def order_years(conn):
+    """{year: [storm, ...]} like the notebook's order_years, with the years in order."""
+    years_dict = {}
+    #the storms_year index has the storms sorted like this already
+    for storm in _storm_dicts(conn, order_by='year, id'):
+        years_dict.setdefault(storm['Year'], []).append(storm)
+    return years_dict
+
+
+def areacounter(conn):
+    """{area: number of storms that hit it} like the notebook's areacounter."""
+    rows = conn.execute(
+        'SELECT a.name, COUNT(*) FROM storm_areas sa JOIN areas a ON a.id = sa.area_id '
+        'GROUP BY sa.area_id ORDER BY sa.area_id')
+    return dict(rows)
+
+
+def most_affected_area(conn):
+    """(area, number of hits) of the area hit most often."""
+    return conn.execute(
+        'SELECT a.name, COUNT(*) AS hits FROM storm_areas sa JOIN areas a ON a.id = sa.area_id '
+        'GROUP BY sa.area_id ORDER BY hits DESC, sa.area_id LIMIT 1').fetchone()
+
+
+def max_deaths(conn):
+    """(name, deaths) of the deadliest hurricane."""
+    return conn.execute('SELECT name, deaths FROM storms ORDER BY deaths DESC LIMIT 1').fetchone()
+
+
+def max_damage(conn):
+    """(name, damage) of the costliest hurricane, leaving out the ones without recorded damage."""
+    return conn.execute(
+        'SELECT name, damage FROM storms WHERE damage IS NOT NULL ORDER BY damage DESC LIMIT 1').fetchone()
+
+
+def _ratings(conn, column, scale):
+    #rating r holds the values above the bound of r - 1 up to the bound of r,
+    #rating 0 holds exactly the bound of 0, and the values above the last bound get the next rating
+    ratings = sorted(scale)
+    cases = ['WHEN {} = ? THEN ?'.format(column)]
+    parameters = [scale[ratings[0]], ratings[0]]
+    for rating in ratings[1:]:
+        cases.append('WHEN {} <= ? THEN ?'.format(column))
+        parameters += [scale[rating], rating]
+    sql = 'SELECT CASE {} ELSE ? END AS rating, name FROM storms WHERE {} IS NOT NULL ORDER BY rating, id'.format(
+        ' '.join(cases), column)
+    parameters.append(ratings[-1] + 1)
+
+    rated = {rating: [] for rating in ratings + [ratings[-1] + 1]}
+    for rating, name in conn.execute(sql, parameters):
+        rated[rating].append(name)
+    return rated
+
+
+def mortality_ratings(conn, scale=MORTALITY_SCALE):
+    """{rating: [hurricane names]} using the notebook's mortality scale."""
+    return _ratings(conn, 'deaths', scale)
+
+
+def damage_ratings(conn, scale=DAMAGE_SCALE):
+    """{rating: [hurricane names]} using the notebook's damage scale, unrecorded damages left out."""
+    return _ratings(conn, 'damage', scale)
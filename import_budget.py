@@ -0,0 +1,95 @@
+"""Check that importing an entry point stays within an import time budget.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+adds up what it reports:
+
+    python import_budget.py stock_profile --budget-ms 100
+
+It fails (exit code 1) when the import takes longer than the budget or when
+it pulls in one of the heavy plotting/data modules, which should only be
+imported once a chart is actually drawn. --compare also times importing those
+heavy modules up front, the way the notebook scripts do, to show the
+difference.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+
+#the modules are imported from the folder of this file, wherever it is run from
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY_MODULES = ['pandas', 'matplotlib', 'seaborn']
+EAGER_IMPORTS = 'import pandas, matplotlib.pyplot, seaborn'
+
+
+def measure_imports(code):
+    """Run `code` under -X importtime, returns {module: (self_us, cumulative_us)}.
+
+    Raises ImportError with the last line of the traceback when `code` fails.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, cwd=REPO_DIR)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        raise ImportError('{!r} failed: {}'.format(code, errors[-1] if errors else 'exit code {}'.format(result.returncode)))
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def total_ms(timings):
+    #the self times of all modules add up to the time spent importing
+    return sum(self_us for self_us, cumulative_us in timings.values()) / 1000
+
+
+def check_budget(module):
+    """Return (milliseconds, heavy modules imported, timings) for importing `module`."""
+    timings = measure_imports('import {}'.format(module))
+    heavy = [name for name in HEAVY_MODULES if name in timings]
+    return total_ms(timings), heavy, timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the import time of an entry point.')
+    parser.add_argument('module', nargs='?', default='stock_profile', help='module to import')
+    parser.add_argument('--budget-ms', type=float, default=100, help='allowed import time in milliseconds')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest modules to list')
+    parser.add_argument('--compare', action='store_true', help='also time importing the heavy modules up front')
+    args = parser.parse_args(argv)
+
+    try:
+        milliseconds, heavy, timings = check_budget(args.module)
+    except ImportError as e:
+        print('FAIL: {}'.format(e))
+        return 1
+    print('import {}: {:.1f} ms (budget {:.0f} ms)'.format(args.module, milliseconds, args.budget_ms))
+    slowest = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print('  {:>8.1f} ms  {}'.format(self_us / 1000, name))
+
+    if args.compare:
+        try:
+            eager_ms = total_ms(measure_imports(EAGER_IMPORTS))
+            print('{}: {:.1f} ms, {:.1f} ms saved'.format(EAGER_IMPORTS, eager_ms, eager_ms - milliseconds))
+        except ImportError as e:
+            print('cannot compare: {}'.format(e))
+
+    failed = False
+    if heavy:
+        print('FAIL: importing {} also imports {}'.format(args.module, ', '.join(heavy)))
+        failed = True
+    if milliseconds > args.budget_ms:
+        print('FAIL: over budget by {:.1f} ms'.format(milliseconds - args.budget_ms))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
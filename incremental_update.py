@@ -0,0 +1,409 @@
+"""Update stock profiles when new prices are appended, without redoing the full history.
+
+stock_profile.py redraws a profile from its complete csv files. When a new
+trading day is added at the end of <SYMBOL>_daily_by_quarter.csv that means
+reading every row and redrawing every chart again. This module keeps running
+state next to the charts, in <out-dir>/<SYMBOL>/state.json, and on every run
+only reads the rows that were appended since the last one:
+
+    python incremental_update.py NFLX AAPL --data-dir data --out-dir profiles
+
+The state holds, for every csv, how far it has been read, and:
+
+    growth     the first price of the ticker and of the benchmark, the base
+               grow_percentage() divides by, and the latest price
+    quarters   per quarter the count, mean and variance of the daily prices
+               and a histogram with fixed width bins
+
+The histogram is the quantile sketch of a quarter and the bins of its KDE,
+so the violin and KDE charts are drawn from the state, not from the rows.
+Adding n new rows costs O(n), however long the history is.
+
+Only the charts whose input changed are drawn again: new daily rows redraw
+violinquarter.png and kdequarter.png; new monthly or benchmark rows redraw
+stockgrowth.png and percentage_growth.png, which plot every point and so read
+their (monthly) csv in full; a changed earnings csv redraws the earnings
+charts. A csv that was rewritten instead of appended to is noticed and the
+state is rebuilt from scratch.
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+
+import stage_timer
+import stock_profile
+from stage_timer import stage
+
+
+STATE_FILE = 'state.json'
+#number of histogram bins across the price range of the first build; prices
+#outside that range just get new bins
+BINS = 512
+
+#input -> the charts drawn from it
+SKETCH_CHARTS = ['violinquarter.png', 'kdequarter.png']
+GROWTH_CHARTS = ['stockgrowth.png', 'percentage_growth.png']
+EARNINGS_CHARTS = [filename for filename, plot, needs_earnings in stock_profile.CHARTS if needs_earnings]
+AFFECTS = {
+    'daily_quarter': SKETCH_CHARTS,
+    'prices': GROWTH_CHARTS,
+    'benchmark': GROWTH_CHARTS,
+    'earnings': EARNINGS_CHARTS,
+}
+
+
+class QuarterStats:
+    """Running count, mean, variance and fixed width histogram of the prices of one quarter.
+
+    Quantiles read from the histogram are off by at most one bin width.
+    """
+
+    def __init__(self, bin_width, count=0, mean=0.0, m2=0.0, low=math.inf, high=-math.inf, bins=None):
+        self.bin_width = bin_width
+        self.count = count
+        self.mean = mean
+        #sum of squared differences from the mean
+        self.m2 = m2
+        self.low = low
+        self.high = high
+        #bin number -> count, bin i holds the prices in [i * bin_width, (i + 1) * bin_width)
+        self.bins = bins if bins is not None else {}
+
+    def add(self, prices):
+        import numpy as np
+
+        prices = np.asarray(prices, dtype=float)
+        prices = prices[~np.isnan(prices)]
+        n = len(prices)
+        if not n:
+            return
+        #merge the mean and variance of the new prices into the running ones
+        batch_mean = float(prices.mean())
+        delta = batch_mean - self.mean
+        total = self.count + n
+        self.m2 += float(((prices - batch_mean) ** 2).sum()) + delta ** 2 * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.low = min(self.low, float(prices.min()))
+        self.high = max(self.high, float(prices.max()))
+
+        numbers, counts = np.unique(np.floor(prices / self.bin_width).astype(np.int64), return_counts=True)
+        for number, count in zip(numbers.tolist(), counts.tolist()):
+            self.bins[number] = self.bins.get(number, 0) + count
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def quantile(self, q):
+        """The `q` quantile, interpolated inside the bin it falls in."""
+        target = q * self.count
+        seen = 0
+        for number in sorted(self.bins):
+            count = self.bins[number]
+            if seen + count >= target:
+                value = (number + (target - seen) / count) * self.bin_width
+                return min(max(value, self.low), self.high)
+            seen += count
+        return self.high
+
+    def bandwidth(self):
+        #Scott's rule, the default of seaborn's kdeplot, but never narrower than a bin
+        return max(self.std * self.count ** -0.2, self.bin_width)
+
+    def density(self, grid):
+        """Gaussian KDE of the prices at the points of `grid`, with every bin standing in for its prices."""
+        import numpy as np
+
+        numbers = np.fromiter(self.bins, dtype=float, count=len(self.bins))
+        counts = np.fromiter(self.bins.values(), dtype=float, count=len(self.bins))
+        centers = (numbers + 0.5) * self.bin_width
+        bandwidth = self.bandwidth()
+        z = (np.asarray(grid, dtype=float)[:, None] - centers[None, :]) / bandwidth
+        return np.exp(-0.5 * z * z) @ counts / (self.count * bandwidth * math.sqrt(2 * math.pi))
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'low': self.low, 'high': self.high,
+                'bins': {str(number): count for number, count in self.bins.items()}}
+
+    @classmethod
+    def from_dict(cls, bin_width, values):
+        bins = {int(number): count for number, count in values['bins'].items()}
+        return cls(bin_width, values['count'], values['mean'], values['m2'], values['low'], values['high'], bins)
+
+
+def read_appended(path, source=None):
+    """The rows appended to the csv at `path` since `source`, and the new `source`.
+
+    `source` records how far the file was read: its header, the byte offset and
+    the last line before that offset. Without a `source` every row is new.
+    Returns (None, None) when the file no longer starts with what was read
+    before, because it was rewritten. A last line that is still being written
+    is left for the next call.
+    """
+    with open(path, 'rb') as f:
+        if source is None:
+            header = f.readline()
+            offset = f.tell()
+            tail = header
+        else:
+            header = source['header'].encode()
+            offset = source['offset']
+            tail = source['tail'].encode()
+            f.seek(offset - len(tail))
+            if f.read(len(tail)) != tail:
+                return None, None
+        data = f.read()
+
+    complete = data[:data.rfind(b'\n') + 1]
+    if complete:
+        tail = complete[complete.rfind(b'\n', 0, len(complete) - 1) + 1:]
+    rows = stock_profile.read_prices(io.BytesIO(header + complete))
+    return rows, {'header': header.decode(), 'offset': offset + len(complete), 'tail': tail.decode()}
+
+
+def state_path(symbol, out_dir):
+    return os.path.join(out_dir, symbol, STATE_FILE)
+
+
+def load_state(symbol, out_dir):
+    path = state_path(symbol, out_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, out_dir):
+    path = state_path(state['symbol'], out_dir)
+    #write next to it and swap, so an interrupted run never leaves half a state
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+
+def new_state(symbol):
+    return {'symbol': symbol, 'sources': {}, 'growth': {}, 'bin_width': None, 'quarters': {}, 'earnings_mtime': None,
+            'stale': []}
+
+
+def choose_bin_width(prices):
+    spread = float(prices.max() - prices.min()) if len(prices) else 0.0
+    if spread > 0:
+        return spread / BINS
+    return max(abs(float(prices.mean())) / BINS, 1e-6) if len(prices) else 1.0
+
+
+def update_state(state, data_dir):
+    """Read what was appended to the csv files of `state` and fold it in.
+
+    Returns {input name: number of new rows}, with 'earnings' in it when the
+    earnings csv changed. Raises ValueError when one of the csv files was
+    rewritten; the caller then starts over with a new state.
+    """
+    symbol = state['symbol']
+    prices_path, daily_path, benchmark_path = stock_profile.input_paths(symbol, data_dir)[:3]
+    changed = {}
+    for name, path in [('prices', prices_path), ('daily_quarter', daily_path), ('benchmark', benchmark_path)]:
+        rows, source = read_appended(path, state['sources'].get(name))
+        if rows is None:
+            raise ValueError('{} was rewritten, not appended to'.format(path))
+        state['sources'][name] = source
+        if not len(rows):
+            continue
+        changed[name] = len(rows)
+
+        if name == 'daily_quarter':
+            if state['bin_width'] is None:
+                state['bin_width'] = choose_bin_width(rows['Price'])
+            for quarter, prices in rows.groupby('Quarter')['Price']:
+                stats = state['quarters'].get(quarter)
+                stats = QuarterStats.from_dict(state['bin_width'], stats) if stats else QuarterStats(state['bin_width'])
+                stats.add(prices)
+                state['quarters'][quarter] = stats.to_dict()
+        else:
+            growth = state['growth'].setdefault(name, {'base': float(rows['Price'].iloc[0])})
+            growth['last'] = float(rows['Price'].iloc[-1])
+            growth['last_date'] = rows['Date'].iloc[-1].isoformat()
+
+    path = stock_profile.earnings_path(symbol, data_dir)
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    if mtime != state['earnings_mtime']:
+        state['earnings_mtime'] = mtime
+        changed['earnings'] = 1
+    return changed
+
+
+def quarter_stats(state):
+    """{quarter: QuarterStats} of the quarters in `state`, in the notebook's order."""
+    return {quarter: QuarterStats.from_dict(state['bin_width'], state['quarters'][quarter])
+            for quarter in stock_profile.QUARTERS if quarter in state['quarters']}
+
+
+def summarize_state(state):
+    """The numbers of stock_profile.summarize_profile(), read from the state alone."""
+    prices = state['growth']['prices']
+    benchmark = state['growth']['benchmark']
+    return {
+        'symbol': state['symbol'],
+        'first_price': prices['base'],
+        'last_price': prices['last'],
+        'growth_percentage': prices['last'] / prices['base'] * 100,
+        'benchmark_growth_percentage': benchmark['last'] / benchmark['base'] * 100,
+        'quarter_mean_price': {quarter: stats.mean for quarter, stats in quarter_stats(state).items()},
+        'quarter_median_price': {quarter: stats.quantile(0.5) for quarter, stats in quarter_stats(state).items()},
+    }
+
+
+def _price_grid(quarters, points=200):
+    import numpy as np
+
+    #reach 2 bandwidths past the extremes, like seaborn's cut=2
+    low = min(stats.low - 2 * stats.bandwidth() for stats in quarters.values())
+    high = max(stats.high + 2 * stats.bandwidth() for stats in quarters.values())
+    return np.linspace(low, high, points)
+
+
+def plot_violin_sketch(canvas, data):
+    """stock_profile.plot_violin() drawn from the quarter histograms instead of the prices."""
+    import seaborn as sns
+
+    [ax] = canvas.axes('single', (15, 10))
+    quarters = data['quarters']
+    grid = _price_grid(quarters)
+    densities = {quarter: stats.density(grid) for quarter, stats in quarters.items()}
+    widest = max(density.max() for density in densities.values())
+    colors = sns.color_palette()
+    for position, quarter in enumerate(stock_profile.QUARTERS):
+        if quarter not in quarters:
+            continue
+        stats = quarters[quarter]
+        #every violin ends 2 bandwidths past its own extremes
+        inside = (grid >= stats.low - 2 * stats.bandwidth()) & (grid <= stats.high + 2 * stats.bandwidth())
+        half_width = 0.4 * densities[quarter][inside] / widest
+        ax.fill_betweenx(grid[inside], position - half_width, position + half_width, color=colors[position],
+                         edgecolor='dimgrey')
+        ax.vlines(position, stats.quantile(0.25), stats.quantile(0.75), color='dimgrey', linewidth=5)
+        ax.scatter([position], [stats.quantile(0.5)], color='white', zorder=3)
+    #seaborn keeps half a slot free on both sides, also for a quarter without prices
+    ax.set_xlim(-0.5, len(stock_profile.QUARTERS) - 0.5)
+    ax.set_xticks(range(len(stock_profile.QUARTERS)))
+    ax.set_xticklabels(stock_profile.QUARTERS)
+    ax.set_ylabel('Closing Stock Price')
+    ax.set_xlabel('Business Quarters')
+    ax.set_title('Distribution of {} Stock Prices by Quarter'.format(data['symbol']))
+
+
+def plot_kde_sketch(canvas, data):
+    """stock_profile.plot_kde() drawn from the quarter histograms instead of the prices."""
+    [ax] = canvas.axes('single', (15, 10))
+    quarters = data['quarters']
+    grid = _price_grid(quarters)
+    for quarter, stats in quarters.items():
+        density = stats.density(grid)
+        [line] = ax.plot(grid, density, label=quarter)
+        ax.fill_between(grid, density, color=line.get_color(), alpha=0.25)
+    ax.set_xlabel('Price')
+    ax.set_ylabel('Density')
+    ax.set_title('Distribution of {} Stock Prices by Quarter'.format(data['symbol']))
+    ax.legend()
+
+
+#the charts of stock_profile, with the quarter charts drawn from the state
+PLOTS = {filename: plot for filename, plot, needs_earnings in stock_profile.CHARTS}
+PLOTS.update({'violinquarter.png': plot_violin_sketch, 'kdequarter.png': plot_kde_sketch})
+
+#one canvas per process, created on first use
+_canvas = None
+
+
+def update_profile(symbol, data_dir, out_dir, rebuild=False, draw=True):
+    """Fold the new rows of `symbol` into its state and redraw the charts they affect.
+
+    Returns (state, {input name: new rows}, [redrawn chart paths]).
+    """
+    global _canvas
+    symbol_dir = os.path.join(out_dir, symbol)
+    os.makedirs(symbol_dir, exist_ok=True)
+
+    state = None if rebuild else load_state(symbol, out_dir)
+    with stage('update_state'):
+        changed = None
+        if state is not None:
+            try:
+                changed = update_state(state, data_dir)
+            except ValueError:
+                changed = None
+        if changed is None:
+            state = new_state(symbol)
+            changed = update_state(state, data_dir)
+
+    #charts a --data-only run left behind are drawn now
+    affected = set(state['stale'])
+    for name in changed:
+        affected.update(AFFECTS[name])
+    outputs = stock_profile.output_paths(symbol, data_dir, out_dir)
+    #charts that were deleted are drawn again as well
+    affected.update(os.path.basename(path) for path in outputs if not os.path.exists(path))
+
+    redrawn = []
+    if draw and affected:
+        if _canvas is None:
+            _canvas = stock_profile.ProfileCanvas()
+        data = {'symbol': symbol, 'quarters': quarter_stats(state)}
+        if affected & set(GROWTH_CHARTS):
+            with stage('load_growth_data'):
+                prices_path, daily_path, benchmark_path = stock_profile.input_paths(symbol, data_dir)[:3]
+                data['prices'] = stock_profile.read_prices(prices_path)
+                data['benchmark'] = stock_profile.read_prices(benchmark_path)
+        if affected & set(EARNINGS_CHARTS):
+            data['earnings'] = stock_profile.load_earnings(symbol, data_dir)
+
+        for path in outputs:
+            filename = os.path.basename(path)
+            if filename not in affected:
+                continue
+            chart = os.path.splitext(filename)[0]
+            with stage(chart):
+                PLOTS[filename](_canvas, data)
+            with stage('savefig_' + chart):
+                _canvas.save(path)
+            redrawn.append(path)
+        with stage('write_charts'):
+            _canvas.wait()
+        #the other charts are still up to date; say so, so stock_profile doesn't redraw them
+        for path in outputs:
+            if path not in redrawn and os.path.exists(path):
+                os.utime(path)
+        affected = set()
+    state['stale'] = sorted(affected)
+
+    save_state(state, out_dir)
+    stage_timer.flush()
+    return state, changed, redrawn
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Update stock profiles with the prices appended since the last run.')
+    parser.add_argument('symbols', nargs='+', help='ticker symbols, e.g. NFLX AAPL')
+    parser.add_argument('--data-dir', default='.', help='folder with the <SYMBOL>.csv files')
+    parser.add_argument('--out-dir', default='profiles', help='folder with the profiles and their state')
+    parser.add_argument('--rebuild', action='store_true', help='forget the state and start from the full history')
+    parser.add_argument('--data-only', action='store_true', help='update the state and print the numbers, don\'t draw')
+    args = parser.parse_args(argv)
+
+    for symbol in args.symbols:
+        state, changed, redrawn = update_profile(symbol, args.data_dir, args.out_dir, args.rebuild,
+                                                 draw=not args.data_only)
+        if args.data_only:
+            print(summarize_state(state))
+        else:
+            new_rows = ', '.join('{} {}'.format(rows, name) for name, rows in changed.items() if name != 'earnings')
+            print('{}: new rows: {}; redrew {} charts'.format(symbol, new_rows or 'none', len(redrawn)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Numbers for the relationship between GDP and life expectancy (LEABY).
+
+life_expectancy_gdp.py reads its conclusions off the FacetGrid plots. The
+functions here compute them for every country or every year at once:
+
+    fits = group_fits(df, 'Country')    # per country: n, r, slope, intercept, log fit
+    fits = group_fits(df, 'Year')       # the same per year, across countries
+    changes = year_over_year(df)        # year on year changes, with unusual jumps flagged
+
+Every fit is computed from grouped sums of the centered values, so all
+groups are done together in a few vectorized groupby passes however many
+countries and years there are. overlay_fits() and mark_changes() draw the
+results onto the facet plots of the script.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _fit(groups, x, y):
+    """OLS slope, intercept and correlation of `y` on `x` for every group, in one pass of grouped sums.
+
+    x and y are centered on their group means first; summing raw squares of
+    GDP values (around 1e13) would lose most of the precision.
+    """
+    x_mean = x.groupby(groups).transform('mean')
+    y_mean = y.groupby(groups).transform('mean')
+    dx = x - x_mean
+    dy = y - y_mean
+    sums = pd.DataFrame({'n': x.notna().astype(int), 'sxx': dx * dx, 'syy': dy * dy, 'sxy': dx * dy}).groupby(groups).sum()
+    means = pd.DataFrame({'x': x_mean, 'y': y_mean}).groupby(groups).first()
+
+    #a group with a single point or no spread in x has no fit
+    slope = (sums['sxy'] / sums['sxx']).where(sums['sxx'] > 0)
+    intercept = means['y'] - slope * means['x']
+    r = (sums['sxy'] / np.sqrt(sums['sxx'] * sums['syy'])).where((sums['sxx'] > 0) & (sums['syy'] > 0))
+    return pd.DataFrame({'n': sums['n'], 'slope': slope, 'intercept': intercept, 'r': r, 'r2': r ** 2})
+
+
+def group_fits(df, by, x='GDP', y='LEABY'):
+    """Correlation and least squares fit of `y` on `x` and on log10(`x`) for every group of `by`.
+
+    Returns one row per group with the columns n, slope, intercept, r, r2 and
+    log_slope, log_intercept, log_r, log_r2 for the fit on log10(x).
+    """
+    data = df[[by, x, y]].dropna()
+    data = data[data[x] > 0]
+    fits = _fit(data[by], data[x], data[y])
+    log_fits = _fit(data[by], np.log10(data[x]), data[y]).drop(columns='n').add_prefix('log_')
+    return pd.concat([fits, log_fits], axis=1)
+
+
+def year_over_year(df, column='LEABY', by='Country', z=2.0):
+    """Year on year change of `column` for every `by` group, with the unusual ones flagged.
+
+    A change is flagged when it is more than `z` standard deviations away
+    from the average change of its own group, so a country that always grows
+    fast is not flagged for that.
+    """
+    data = df[[by, 'Year', column]].sort_values([by, 'Year'])
+    grouped = data.groupby(by)[column]
+    data['change'] = grouped.diff()
+    data['pct_change'] = grouped.pct_change() * 100
+    changes = data.groupby(by)['change']
+    score = (data['change'] - changes.transform('mean')) / changes.transform('std')
+    data['zscore'] = score
+    data['flagged'] = score.abs() > z
+    return data.reset_index(drop=True)
+
+
+def overlay_fits(grid, fits, log_x=False, **line_kws):
+    """Draw the fit line of every facet of a FacetGrid, `fits` indexed by the facet values.
+
+    For the scatter grid with col='Year' use group_fits(df, 'Year').
+    """
+    prefix = 'log_' if log_x else ''
+    line_kws.setdefault('color', 'grey')
+    line_kws.setdefault('linestyle', '--')
+    for facet, ax in grid.axes_dict.items():
+        if facet not in fits.index or pd.isna(fits.loc[facet, prefix + 'slope']):
+            continue
+        fit = fits.loc[facet]
+        xlim = ax.get_xlim()
+        xs = np.linspace(*xlim, num=50)
+        if log_x:
+            xs = xs[xs > 0]
+            ys = fit['log_intercept'] + fit['log_slope'] * np.log10(xs)
+        else:
+            ys = fit['intercept'] + fit['slope'] * xs
+        ax.plot(xs, ys, **line_kws)
+        ax.set_xlim(xlim)
+        ax.annotate('r={:.2f}'.format(fit[prefix + 'r']), xy=(0.05, 0.9), xycoords='axes fraction', fontsize='small')
+
+
+def mark_changes(grid, changes, column='LEABY', by='Country', **scatter_kws):
+    """Mark the flagged year on year changes on a FacetGrid with col=`by` and x='Year'."""
+    scatter_kws.setdefault('color', 'red')
+    scatter_kws.setdefault('zorder', 3)
+    flagged = changes[changes['flagged']]
+    for country, ax in grid.axes_dict.items():
+        points = flagged[flagged[by] == country]
+        ax.scatter(points['Year'], points[column], **scatter_kws)
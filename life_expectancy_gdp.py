@@ -29,9 +29,16 @@
 # - `import seaborn as sns`
 
 # %%
-from matplotlib import pyplot as plt
+#pyplot and seaborn are imported right before the first chart (step 5),
+#so running only the data cells doesn't pay for loading them
 import pandas as pd
-import seaborn as sns
+
+#opt-in timing of the stages below, see stage_timer.py
+from stage_timer import stage
+
+#the charts are drawn here and written to their files by worker threads, see figure_output.py
+from figure_output import FigureOutput
+output = FigureOutput(dpi=100,layout_cache='figure_layout.json')
 
 # %% [markdown]
 # ## Step 2 Prep The Data
@@ -45,7 +52,8 @@ import seaborn as sns
 # 
 
 # %%
-df = pd.read_csv('all_data.csv')
+with stage('load_all_data'):
+    df = pd.read_csv('all_data.csv')
 df.head()
 
 # %% [markdown]
@@ -87,9 +95,22 @@ print(years)
 # Hint: Use `.rename()`. [You can read the documentation here.](https://pandas.pydata.org/pandas-docs/stable/generated/pandas.DataFrame.rename.html)). </font>
 
 # %%
-df.rename(columns={'Life expectancy at birth (years)':'LEABY'},inplace=True)
+with stage('rename_columns'):
+    df.rename(columns={'Life expectancy at birth (years)':'LEABY'},inplace=True)
 df.head()
 
+# %%
+#correlation and fits of LEABY on GDP per country and per year, and the yearly changes
+#see leaby_gdp_analysis.py
+from leaby_gdp_analysis import group_fits, year_over_year, overlay_fits, mark_changes
+
+with stage('fit_leaby_gdp'):
+    country_fits = group_fits(df, 'Country')
+    year_fits = group_fits(df, 'Year')
+    leaby_changes = year_over_year(df, 'LEABY')
+    gdp_changes = year_over_year(df, 'GDP')
+print(country_fits[['r', 'slope', 'log_r', 'log_slope']])
+
 # %% [markdown]
 # Run `df.head()` again to check your new column name worked.
 
@@ -109,32 +130,40 @@ df.head()
 # Remember to `plt.show()` your chart!
 
 # %%
-chile = df[df.Country == 'Chile']
-maxgdpchile = max(chile.GDP)
-zim = df[df.Country == 'Zimbabwe']
+with stage('filter_country'):
+    chile = df[df.Country == 'Chile']
+    maxgdpchile = max(chile.GDP)
+    zim = df[df.Country == 'Zimbabwe']
 
 # %%
-chilezim = chile.append(zim, ignore_index=True)
+with stage('combine_chile_zim'):
+    chilezim = chile.append(zim, ignore_index=True)
 
 # %%
 chilezim.head()
 
 # %%
-plt.figure(figsize=(15,8))
-sns.set_palette('pastel')
-sns.set_style('whitegrid')
-ax = sns.barplot(data=df,x='Country',y='GDP')
+from matplotlib import pyplot as plt
+import seaborn as sns
+
+with stage('barplot_gdp'):
+    plt.figure(figsize=(15,8))
+    sns.set_palette('pastel')
+    sns.set_style('whitegrid')
+    ax = sns.barplot(data=df,x='Country',y='GDP')
 plt.show()
 
 # %%
 
-plt.figure(figsize=(15,8))
-ax = sns.barplot(data=chilezim,x='Country',y='GDP')
+with stage('barplot_gdp_chilezim'):
+    plt.figure(figsize=(15,8))
+    ax = sns.barplot(data=chilezim,x='Country',y='GDP')
 plt.show()
 
 
 # %%
-ax = sns.barplot(data=zim,x='Country',y='GDP')
+with stage('barplot_gdp_zim'):
+    ax = sns.barplot(data=zim,x='Country',y='GDP')
 plt.show()
 
 # %% [markdown]
@@ -142,8 +171,9 @@ plt.show()
 # Remember to `plt.show()` your chart!
 
 # %%
-plt.figure(figsize=(15,5))
-sns.barplot(data=df,x='Country',y='LEABY')
+with stage('barplot_leaby'):
+    plt.figure(figsize=(15,5))
+    sns.barplot(data=df,x='Country',y='LEABY')
 plt.show()
 
 
@@ -166,10 +196,12 @@ plt.show()
 # 2. Be sure to show your plot
 
 # %%
-fig = plt.subplots(figsize=(15, 10))
-sns.violinplot(data=df,x='Country',y='LEABY')
-plt.title('LEABY per Country',fontsize=20)
-plt.savefig('1-violin_lifeexp.png')
+with stage('violin_leaby'):
+    fig = plt.subplots(figsize=(15, 10))
+    sns.violinplot(data=df,x='Country',y='LEABY')
+    plt.title('LEABY per Country',fontsize=20)
+with stage('savefig_1-violin_lifeexp'):
+    output.save(plt.gcf(),'1-violin_lifeexp.png')
 plt.show()
 
 # %% [markdown]
@@ -195,57 +227,62 @@ plt.show()
 # 
 
 # %%
-f, ax = plt.subplots(figsize=(10, 15)) 
-ax = sns.barplot(data=df,x='Country',y='GDP',hue='Year')
-plt.xticks(rotation=60)
-plt.ylabel('GDP in Trillion USD')
+with stage('barplot_gdp_year'):
+    f, ax = plt.subplots(figsize=(10, 15)) 
+    ax = sns.barplot(data=df,x='Country',y='GDP',hue='Year')
+    plt.xticks(rotation=60)
+    plt.ylabel('GDP in Trillion USD')
 plt.show()
 
 # %%
 #giving chile and zim its own charts to get information for this data
 
-f, ax = plt.subplots(figsize=(10, 10)) 
-ax = sns.barplot(data=chilezim,x='Country',y='GDP',hue='Year')
-plt.xticks(rotation=60)
-plt.ylabel('GDP in 10 Billions USD')
+with stage('barplot_gdp_year_chilezim'):
+    f, ax = plt.subplots(figsize=(10, 10)) 
+    ax = sns.barplot(data=chilezim,x='Country',y='GDP',hue='Year')
+    plt.xticks(rotation=60)
+    plt.ylabel('GDP in 10 Billions USD')
 plt.show()
 
 # %%
 #giving  zim its own charts to get information for this data
 
-f, ax = plt.subplots(figsize=(10, 10)) 
-ax = sns.barplot(data=zim,x='Country',y='GDP',hue='Year')
-plt.xticks(rotation=60)
-plt.ylabel('GDP in Billion USD')
+with stage('barplot_gdp_year_zim'):
+    f, ax = plt.subplots(figsize=(10, 10)) 
+    ax = sns.barplot(data=zim,x='Country',y='GDP',hue='Year')
+    plt.xticks(rotation=60)
+    plt.ylabel('GDP in Billion USD')
 plt.show()
 
 # %%
-fig = plt.figure(figsize=(15,15))
-plt.tight_layout(rect=[0, 0, 1, 0.95])
-plt.suptitle('GDP per country',x=.4,y=.9,fontsize=20)
-
-ax1 = plt.subplot2grid((3,3),(0,0),colspan=2)
-ax1 = sns.barplot(data=df,x='Country',y='GDP',hue='Year',palette='pastel')
-plt.xticks(rotation=15)
-plt.ylabel('GDP in 10 Trillion USD')
-ax1.legend(bbox_to_anchor=(1.05, 1))
-ax1.set_xlabel(None)
-
-ax2 = plt.subplot2grid((3,3),(1,0),colspan=1,rowspan=1)
-ax2 = sns.barplot(data=chilezim,x='Country',y='GDP',hue='Year',palette='pastel')
-plt.xticks(rotation=15)
-plt.ylabel('GDP in 100 Billions USD')
-ax2.legend().remove()
-ax2.set_xlabel(None)
-
-ax3 = plt.subplot2grid((3,3),(1,1),colspan=1,rowspan=1)
-ax3 = sns.barplot(data=zim,x='Country',y='GDP',hue='Year',palette='pastel')
-plt.xticks(rotation=15)
-plt.ylabel('GDP in 10 Billion USD')
-ax3.legend().remove()
-ax3.set_xlabel(None)
-
-plt.savefig('11-gdp_per_country.png',bbox_inches='tight')
+with stage('gdp_per_country'):
+    fig = plt.figure(figsize=(15,15))
+    plt.tight_layout(rect=[0, 0, 1, 0.95])
+    plt.suptitle('GDP per country',x=.4,y=.9,fontsize=20)
+
+    ax1 = plt.subplot2grid((3,3),(0,0),colspan=2)
+    ax1 = sns.barplot(data=df,x='Country',y='GDP',hue='Year',palette='pastel')
+    plt.xticks(rotation=15)
+    plt.ylabel('GDP in 10 Trillion USD')
+    ax1.legend(bbox_to_anchor=(1.05, 1))
+    ax1.set_xlabel(None)
+
+    ax2 = plt.subplot2grid((3,3),(1,0),colspan=1,rowspan=1)
+    ax2 = sns.barplot(data=chilezim,x='Country',y='GDP',hue='Year',palette='pastel')
+    plt.xticks(rotation=15)
+    plt.ylabel('GDP in 100 Billions USD')
+    ax2.legend().remove()
+    ax2.set_xlabel(None)
+
+    ax3 = plt.subplot2grid((3,3),(1,1),colspan=1,rowspan=1)
+    ax3 = sns.barplot(data=zim,x='Country',y='GDP',hue='Year',palette='pastel')
+    plt.xticks(rotation=15)
+    plt.ylabel('GDP in 10 Billion USD')
+    ax3.legend().remove()
+    ax3.set_xlabel(None)
+
+with stage('savefig_11-gdp_per_country'):
+    output.save(plt.gcf(),'11-gdp_per_country.png',tight=True)
 plt.show()
 
 # %% [markdown]
@@ -257,22 +294,25 @@ plt.show()
 # 
 
 # %%
-f, ax = plt.subplots(figsize=(10, 9))
-#sns.color_palette('powderblue',16)
-ax = sns.barplot(data=df,x='Country',y='LEABY',hue='Year',palette='pastel')
-plt.xticks(rotation=60)
-plt.ylim(40,85)
-plt.ylabel('Life Expectancy at birth')
-plt.title('Life Expectancy per Country per Year',fontsize=20)
-plt.savefig('12-leaby_country.png')
+with stage('barplot_leaby_year'):
+    f, ax = plt.subplots(figsize=(10, 9))
+    #sns.color_palette('powderblue',16)
+    ax = sns.barplot(data=df,x='Country',y='LEABY',hue='Year',palette='pastel')
+    plt.xticks(rotation=60)
+    plt.ylim(40,85)
+    plt.ylabel('Life Expectancy at birth')
+    plt.title('Life Expectancy per Country per Year',fontsize=20)
+with stage('savefig_12-leaby_country'):
+    output.save(plt.gcf(),'12-leaby_country.png')
 plt.show()
 
 # %%
-f, ax = plt.subplots(figsize=(10, 9)) 
-ax = sns.barplot(data=zim,x='Country',y='LEABY',hue='Year')
-plt.xticks(rotation=60)
-plt.ylim(40,65)
-plt.ylabel('Life Expectancy at birth')
+with stage('barplot_leaby_year_zim'):
+    f, ax = plt.subplots(figsize=(10, 9)) 
+    ax = sns.barplot(data=zim,x='Country',y='LEABY',hue='Year')
+    plt.xticks(rotation=60)
+    plt.ylim(40,65)
+    plt.ylabel('Life Expectancy at birth')
 plt.show()
 
 # %%
@@ -324,11 +364,14 @@ plt.show()
 
 # %%
 # Uncomment the code below and fill in the blanks
-g = sns.FacetGrid(data=df, col='Year', hue='Country', col_wrap=4, height=2)
-g.map(plt.scatter,'GDP','LEABY', edgecolor="w").add_legend()
-plt.suptitle('LEABY vs GDP /year /country',fontsize=20)
-plt.subplots_adjust(top=0.90)
-plt.savefig('2-scatter_gpd_lifexp.png')
+with stage('facet_scatter_gdp_leaby'):
+    g = sns.FacetGrid(data=df, col='Year', hue='Country', col_wrap=4, height=2)
+    g.map(plt.scatter,'GDP','LEABY', edgecolor="w").add_legend()
+    overlay_fits(g, year_fits)
+    plt.suptitle('LEABY vs GDP /year /country',fontsize=20)
+    plt.subplots_adjust(top=0.90)
+with stage('savefig_2-scatter_gpd_lifexp'):
+    output.save(plt.gcf(),'2-scatter_gpd_lifexp.png')
 
 # %% [markdown]
 # + Which country moves the most along the X axis over the years?
@@ -372,11 +415,14 @@ plt.savefig('2-scatter_gpd_lifexp.png')
 
 
 # Uncomment the code below and fill in the blanks
-g3 = sns.FacetGrid(df, col="Country", col_wrap=3, height=4)
-g3.map(sns.lineplot, "Year", "LEABY").add_legend()
-plt.suptitle('LEABY /year /country',fontsize=20)
-plt.subplots_adjust(top=0.90)
-plt.savefig('4-facet_lifexp_country.png')
+with stage('facet_leaby'):
+    g3 = sns.FacetGrid(df, col="Country", col_wrap=3, height=4)
+    g3.map(sns.lineplot, "Year", "LEABY").add_legend()
+    mark_changes(g3, leaby_changes, 'LEABY')
+    plt.suptitle('LEABY /year /country',fontsize=20)
+    plt.subplots_adjust(top=0.90)
+with stage('savefig_4-facet_lifexp_country'):
+    output.save(plt.gcf(),'4-facet_lifexp_country.png')
 
 # %% [markdown]
 # What are your first impressions looking at the visualized data?
@@ -402,11 +448,14 @@ plt.savefig('4-facet_lifexp_country.png')
 # 
 
 # %%
-g3 = sns.FacetGrid(df, col="Country", col_wrap=3, height=4)
-g3.map(sns.lineplot, "Year", "GDP").add_legend()
-plt.suptitle('GBP /year /country',fontsize=20)
-plt.subplots_adjust(top=0.90)
-plt.savefig('3-facet_gdp_country.png')
+with stage('facet_gdp'):
+    g3 = sns.FacetGrid(df, col="Country", col_wrap=3, height=4)
+    g3.map(sns.lineplot, "Year", "GDP").add_legend()
+    mark_changes(g3, gdp_changes, 'GDP')
+    plt.suptitle('GBP /year /country',fontsize=20)
+    plt.subplots_adjust(top=0.90)
+with stage('savefig_3-facet_gdp_country'):
+    output.save(plt.gcf(),'3-facet_gdp_country.png')
 
 # %% [markdown]
 # Which countries have the highest and lowest GDP?
@@ -434,6 +483,15 @@ plt.savefig('3-facet_gdp_country.png')
 #how come the zim line changed so much?
 #they got better access to health care and they had a cleanup of shanty towns after the US used their name in a bad way
 
+# %%
+#the years where a country's life expectancy or gdp changed a lot more than it usually does
+print(leaby_changes[leaby_changes['flagged']])
+print(gdp_changes[gdp_changes['flagged']])
+
+# %%
+#wait until every chart is written, and show the size of each file and how long it took
+output.print_report()
+
 
 # %% [markdown]
 # ## Step 12 Create Blog Post
@@ -0,0 +1,163 @@
+"""Download daily or intraday prices for many tickers at once.
+
+`Netfilx vs DJI stock price project.py` and stock_profile.py read prices from
+csv files that were downloaded by hand. This module fetches them for any
+number of symbols concurrently, with asyncio and one pooled aiohttp session:
+
+    python price_feed.py NFLX DJI AAPL --base-url http://prices.local --data-dir data
+
+Every symbol is fetched from `<base-url>/<SYMBOL>.csv?interval=1d`, which must
+answer with a Yahoo style csv (Date, Open, High, Low, Close, Adj Close,
+Volume). The csv is written to <data-dir>/<SYMBOL>.csv as it came in, so
+the scripts can read it unchanged. refresh() also returns every symbol's
+prices as a frame laid out like the script's after
+`rename(columns={'Adj Close':'Price'})`, with 'Date' parsed.
+
+At most `concurrency` requests are open at a time over the connection pool.
+Failed requests (connection errors, timeouts, 429 and 5xx) are retried with
+exponential backoff. Downloads go through a bounded queue to the code that
+parses and writes them in `writers` threads, so fetching waits when writing
+falls behind. Pointing
+--base-url at a local server is all it takes to run this against stand-in
+data.
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import sys
+
+import aiohttp
+import pandas as pd
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FeedError(Exception):
+    """A symbol could not be fetched, even after retrying."""
+
+
+def parse_prices(text):
+    """A downloaded csv as the frame layout of the script: 'Date' parsed and 'Adj Close' renamed to 'Price'."""
+    prices = pd.read_csv(io.StringIO(text), parse_dates=['Date'])
+    if 'Adj Close' not in prices.columns:
+        raise ValueError('no Adj Close column')
+    prices.rename(columns={'Adj Close': 'Price'}, inplace=True)
+    return prices
+
+
+async def fetch_csv(session, base_url, symbol, interval='1d', retries=3, backoff=0.5):
+    """Download the csv of one symbol, retrying errors that may go away."""
+    url = '{}/{}.csv'.format(base_url.rstrip('/'), symbol)
+    for attempt in range(retries + 1):
+        try:
+            async with session.get(url, params={'interval': interval}) as response:
+                if response.status not in RETRY_STATUSES:
+                    if response.status != 200:
+                        raise FeedError('{}: HTTP {}'.format(symbol, response.status))
+                    try:
+                        return await response.text()
+                    except UnicodeDecodeError as e:
+                        raise FeedError('{}: the body is not text ({})'.format(symbol, e))
+                error = 'HTTP {}'.format(response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = repr(e)
+        if attempt < retries:
+            #exponential backoff with jitter, so retries of many symbols don't arrive together
+            await asyncio.sleep(backoff * 2 ** attempt * (0.5 + random.random()))
+    raise FeedError('{}: gave up after {} attempts, last error {}'.format(symbol, retries + 1, error))
+
+
+async def refresh_async(symbols, base_url, data_dir=None, interval='1d', concurrency=32, retries=3,
+                        timeout=30, queue_size=None, writers=4):
+    """Fetch all `symbols` and return ({symbol: prices frame}, {symbol: error message})."""
+    symbol_queue = asyncio.Queue()
+    for symbol in symbols:
+        symbol_queue.put_nowait(symbol)
+    #downloads wait here for the writer; when it is full the fetchers stop fetching
+    downloaded = asyncio.Queue(maxsize=queue_size or concurrency * 2)
+    frames = {}
+    errors = {}
+
+    async def fetcher(session):
+        while True:
+            try:
+                symbol = symbol_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                text = await fetch_csv(session, base_url, symbol, interval, retries)
+            except FeedError as e:
+                errors[symbol] = str(e)
+                continue
+            except Exception as e:
+                #whatever goes wrong with one symbol must not stop the others
+                errors[symbol] = '{}: {!r}'.format(symbol, e)
+                continue
+            await downloaded.put((symbol, text))
+
+    def store(symbol, text):
+        #parse first, so a broken download never replaces a good csv
+        prices = parse_prices(text)
+        if data_dir is not None:
+            path = os.path.join(data_dir, '{}.csv'.format(symbol))
+            with open(path + '.tmp', 'w') as f:
+                f.write(text)
+            os.replace(path + '.tmp', path)
+        return prices
+
+    async def writer():
+        while True:
+            item = await downloaded.get()
+            if item is None:
+                return
+            symbol, text = item
+            try:
+                #parsing and writing files would block the event loop, so it runs in a thread
+                frames[symbol] = await asyncio.to_thread(store, symbol, text)
+            except Exception as e:
+                errors[symbol] = '{}: {!r}'.format(symbol, e)
+
+    if data_dir is not None:
+        os.makedirs(data_dir, exist_ok=True)
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        writer_tasks = [asyncio.create_task(writer()) for _ in range(writers)]
+        try:
+            await asyncio.gather(*[fetcher(session) for _ in range(min(concurrency, len(symbols)))])
+        finally:
+            #tell the writers to stop, also when fetching failed, so none is left pending
+            for _ in writer_tasks:
+                await downloaded.put(None)
+            await asyncio.gather(*writer_tasks)
+    return frames, errors
+
+
+def refresh(symbols, base_url, data_dir=None, **kwargs):
+    """Blocking version of refresh_async()."""
+    return asyncio.run(refresh_async(symbols, base_url, data_dir, **kwargs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Download the prices of many tickers at once.')
+    parser.add_argument('symbols', nargs='+', help='ticker symbols, e.g. NFLX DJI')
+    parser.add_argument('--base-url', required=True, help='server answering <base-url>/<SYMBOL>.csv')
+    parser.add_argument('--data-dir', default='.', help='folder to write the <SYMBOL>.csv files to')
+    parser.add_argument('--interval', default='1d', help='bar size to ask for, e.g. 1d or 5m')
+    parser.add_argument('--concurrency', type=int, default=32, help='maximum number of open requests')
+    parser.add_argument('--retries', type=int, default=3, help='retries per symbol')
+    args = parser.parse_args(argv)
+
+    frames, errors = refresh(args.symbols, args.base_url, args.data_dir, interval=args.interval,
+                             concurrency=args.concurrency, retries=args.retries)
+    print('{} symbols fetched into {}'.format(len(frames), args.data_dir))
+    for symbol, error in sorted(errors.items()):
+        print('failed: {}'.format(error))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""A local stand-in for the price server, and a check of price_feed against it.
+
+    python price_feed_standin.py
+
+starts an aiohttp server on 127.0.0.1 that answers like a flaky real one,
+runs price_feed.refresh() against it and checks that:
+
+    FLAKY    answers 503 twice and then the csv, and is fetched after retrying
+    MISSING  answers 404 and is reported as an error, without retries
+    HTML     answers 200 with a web page; it is an error, and the good
+             HTML.csv that was already in the data folder is left alone
+    BIN      answers 200 with bytes that aren't text; it is an error and the
+             other symbols are still fetched
+    GOOD     is written to the data folder and returned with 'Date' as
+             datetime64 and 'Adj Close' renamed to 'Price'
+
+It prints what failed and exits with 1, or prints 'ok'. serve() can also be
+used on its own to try price_feed by hand.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+import pandas as pd
+from aiohttp import web
+
+import price_feed
+
+
+PRICES_CSV = ('Date,Open,High,Low,Close,Adj Close,Volume\n'
+              '2017-01-03,124.9,128.2,124.3,127.5,127.5,9437900\n'
+              '2017-01-04,127.5,130.2,127.0,129.4,129.4,7843600\n')
+
+
+def make_app(flaky_failures=2):
+    """The stand-in server; FLAKY fails `flaky_failures` times before it answers."""
+    calls = {'FLAKY': 0}
+
+    async def prices(request):
+        symbol = request.match_info['symbol']
+        if symbol == 'MISSING':
+            return web.Response(status=404, text='not found')
+        if symbol == 'FLAKY':
+            calls['FLAKY'] += 1
+            if calls['FLAKY'] <= flaky_failures:
+                return web.Response(status=503, text='try again')
+        if symbol == 'HTML':
+            return web.Response(text='<html>oops</html>', content_type='text/html')
+        if symbol == 'BIN':
+            return web.Response(body=b'\xff\xfe\x00garbage', content_type='text/csv', charset='utf-8')
+        return web.Response(text=PRICES_CSV, content_type='text/csv')
+
+    app = web.Application()
+    app.router.add_get('/{symbol}.csv', prices)
+    app['calls'] = calls
+    return app
+
+
+async def serve(app, host='127.0.0.1', port=0):
+    """Start `app` and return (runner, base url); port 0 picks a free port."""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, 'http://{}:{}'.format(host, port)
+
+
+async def check(data_dir):
+    """Run price_feed against the stand-in and return a list of what went wrong."""
+    app = make_app()
+    runner, base_url = await serve(app)
+    good_html = 'Date,Adj Close\n2017-01-03,1.0\n'
+    with open(os.path.join(data_dir, 'HTML.csv'), 'w') as f:
+        f.write(good_html)
+    try:
+        frames, errors = await price_feed.refresh_async(
+            ['GOOD', 'FLAKY', 'MISSING', 'HTML', 'BIN'], base_url, data_dir, retries=3, timeout=10)
+    finally:
+        await runner.cleanup()
+
+    problems = []
+    if sorted(frames) != ['FLAKY', 'GOOD']:
+        problems.append('fetched {}, expected FLAKY and GOOD'.format(sorted(frames)))
+    if sorted(errors) != ['BIN', 'HTML', 'MISSING']:
+        problems.append('errors for {}, expected BIN, HTML and MISSING'.format(sorted(errors)))
+    if app['calls']['FLAKY'] != 3:
+        problems.append('FLAKY was asked {} times, expected 3'.format(app['calls']['FLAKY']))
+    if 'HTTP 404' not in errors.get('MISSING', ''):
+        problems.append('MISSING error is {!r}'.format(errors.get('MISSING')))
+    with open(os.path.join(data_dir, 'HTML.csv')) as f:
+        if f.read() != good_html:
+            problems.append('the bad HTML download replaced HTML.csv')
+    with open(os.path.join(data_dir, 'GOOD.csv')) as f:
+        if f.read() != PRICES_CSV:
+            problems.append('GOOD.csv is not the downloaded csv')
+    good = frames.get('GOOD')
+    if good is not None:
+        if not pd.api.types.is_datetime64_any_dtype(good['Date']):
+            problems.append('Date is {}, not datetime64'.format(good['Date'].dtype))
+        if 'Price' not in good.columns or 'Adj Close' in good.columns:
+            problems.append('Adj Close was not renamed to Price: {}'.format(list(good.columns)))
+    return problems
+
+
+def main():
+    with tempfile.TemporaryDirectory() as data_dir:
+        problems = asyncio.run(check(data_dir))
+    for problem in problems:
+        print('FAILED: {}'.format(problem))
+    if not problems:
+        print('ok')
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Opt-in timing of the named stages of the analysis scripts.
+
+Wrap a stage of work in `stage()`:
+
+    from stage_timer import stage
+
+    with stage('load_all_data'):
+        df = pd.read_csv('all_data.csv')
+
+Nothing is measured unless profiling is switched on, so the wrappers can stay
+in the scripts. Switch it on with an environment variable naming the report
+file:
+
+    STAGE_PROFILE=report.json python life_expectancy_gdp.py
+
+or by calling `enable()` from a notebook. A '{pid}' in the file name is
+replaced by the process id, so every worker of a process pool writes its own
+report.
+
+For every stage the report holds the wall time, the CPU time and the peak
+traced memory (tracemalloc, turn it off with STAGE_PROFILE_MEMORY=0 because it
+slows everything down). Stages can be nested; the report is written as JSON,
+and next to it a '.folded' file with one 'outer;inner microseconds' line per
+stage, the input format of flamegraph.pl and speedscope.
+"""
+
+import atexit
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+_enabled = False
+_trace_memory = False
+_report_path = None
+_stack = []
+_records = []
+
+
+def enable(report_path=None, memory=True):
+    """Start recording stages, and write the report to `report_path` when the process exits."""
+    global _enabled, _trace_memory, _report_path
+    _enabled = True
+    _trace_memory = memory
+    _report_path = report_path
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Forget everything recorded so far."""
+    del _records[:]
+
+
+class _Frame:
+    def __init__(self, name):
+        self.name = name
+        self.path = ';'.join([frame.name for frame in _stack] + [name])
+        self.child_wall = 0.0
+        self.peak = 0
+
+
+@contextmanager
+def stage(name):
+    """Record the wall time, CPU time and peak memory of the code in the with block."""
+    if not _enabled:
+        yield
+        return
+
+    frame = _Frame(name)
+    if _trace_memory:
+        #keep the peak seen by the outer stage so far, then measure this one from here
+        peak = tracemalloc.get_traced_memory()[1]
+        if _stack:
+            _stack[-1].peak = max(_stack[-1].peak, peak)
+        tracemalloc.reset_peak()
+    _stack.append(frame)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        _stack.pop()
+        if _trace_memory:
+            frame.peak = max(frame.peak, tracemalloc.get_traced_memory()[1])
+        if _stack:
+            _stack[-1].child_wall += wall
+            _stack[-1].peak = max(_stack[-1].peak, frame.peak)
+        _records.append({
+            'stage': name,
+            'path': frame.path,
+            'wall_s': wall,
+            'self_wall_s': wall - frame.child_wall,
+            'cpu_s': cpu,
+            'peak_mem_bytes': frame.peak if _trace_memory else None,
+        })
+
+
+def timed(name=None):
+    """Decorator version of stage(), named after the function unless `name` is given."""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def records():
+    """The stages recorded so far, in the order they finished."""
+    return list(_records)
+
+
+def report():
+    """Per run report: every stage plus the totals per stage name."""
+    totals = {}
+    for record in _records:
+        total = totals.setdefault(record['stage'], {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_mem_bytes': None})
+        total['calls'] += 1
+        total['wall_s'] += record['wall_s']
+        total['cpu_s'] += record['cpu_s']
+        if record['peak_mem_bytes'] is not None:
+            total['peak_mem_bytes'] = max(total['peak_mem_bytes'] or 0, record['peak_mem_bytes'])
+    return {'pid': os.getpid(), 'stages': records(), 'totals': totals}
+
+
+def folded():
+    """The stages as folded stacks, 'outer;inner <self time in microseconds>' per line."""
+    self_times = {}
+    for record in _records:
+        self_times[record['path']] = self_times.get(record['path'], 0) + record['self_wall_s']
+    return ''.join('{} {}\n'.format(path, int(seconds * 1e6)) for path, seconds in self_times.items())
+
+
+def write_report(path=None):
+    """Write the JSON report and the .folded file next to it, returns the JSON path."""
+    path = (path or _report_path or 'stage_report.json').replace('{pid}', str(os.getpid()))
+    with open(path, 'w') as f:
+        json.dump(report(), f, indent=2)
+    with open(os.path.splitext(path)[0] + '.folded', 'w') as f:
+        f.write(folded())
+    return path
+
+
+def flush():
+    """Write the report now if profiling is on, for processes that never run atexit handlers."""
+    if _enabled and _records:
+        write_report()
+
+
+@atexit.register
+def _write_at_exit():
+    if _enabled and _report_path and _records:
+        write_report()
+
+
+if os.environ.get('STAGE_PROFILE'):
+    enable(os.environ['STAGE_PROFILE'], memory=os.environ.get('STAGE_PROFILE_MEMORY', '1') != '0')
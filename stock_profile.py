@@ -0,0 +1,395 @@
+"""Headless batch version of the Netflix stock profile.
+
+`Netfilx vs DJI stock price project.py` builds a single Netflix profile cell by
+cell and saves every chart under a fixed filename. This module builds the same
+profile for any number of tickers:
+
+    python stock_profile.py NFLX AAPL MSFT --data-dir data --out-dir profiles
+
+For every symbol it expects the files the notebook used, named after the
+ticker:
+
+    <data-dir>/<SYMBOL>.csv                    monthly prices (Date, Adj Close)
+    <data-dir>/<SYMBOL>_daily_by_quarter.csv   daily prices with a Quarter column
+    <data-dir>/<SYMBOL>_earnings.csv           optional, see load_earnings()
+    <data-dir>/DJI.csv                         the benchmark, shared by all
+
+and writes the charts to <out-dir>/<SYMBOL>/ with the filenames the notebook
+used (violinquarter.png, kdequarter.png, ...).
+
+Rendering runs on the Agg backend in a process pool. Each worker builds one
+figure with its axes once and clears and reuses them for every chart of every
+ticker it is handed, instead of paying for a new figure per chart.
+
+pandas, matplotlib and seaborn are imported inside the functions that need
+them. A profile whose charts are newer than its csv files is not rebuilt (use
+--force), and --data-only prints the numbers without drawing anything, so
+neither of those runs pays for importing the plotting modules.
+import_budget.py measures this.
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import stage_timer
+from stage_timer import stage
+
+
+BENCHMARK = 'DJI'
+QUARTERS = ['Q1', 'Q2', 'Q3', 'Q4']
+
+#the 2017 numbers from the notebook, used when there is no NFLX_earnings.csv
+NETFLIX_EARNINGS = {
+    'Quarter': ['1Q2017', '2Q2017', '3Q2017', '4Q2017'],
+    'EPS Actual': [.4, .15, .29, .41],
+    'EPS Estimate': [.37, .15, .32, .41],
+    'Revenue Quarter': ['2Q2017', '3Q2017', '4Q2017', '1Q2018'],
+    'Revenue': [2.79, 2.98, 3.29, 3.7],
+    'Earnings': [.0656, .12959, .18552, .29012],
+}
+
+
+def read_prices(path):
+    """Read a Yahoo style price csv and rename 'Adj Close' to 'Price' like the notebook does.
+
+    'Date' is parsed to datetime64 so the line charts get a real date axis.
+    """
+    import pandas as pd
+
+    prices = pd.read_csv(path, parse_dates=['Date'])
+    prices.rename(columns={'Adj Close': 'Price'}, inplace=True)
+    return prices
+
+
+def load_earnings(symbol, data_dir):
+    """Quarterly earnings for `symbol`, or None when there are none.
+
+    <SYMBOL>_earnings.csv has the columns Quarter, EPS Actual, EPS Estimate,
+    Revenue Quarter, Revenue and Earnings, the same layout as NETFLIX_EARNINGS.
+    """
+    import pandas as pd
+
+    path = earnings_path(symbol, data_dir)
+    if os.path.exists(path):
+        return pd.read_csv(path)
+    if symbol == 'NFLX':
+        return pd.DataFrame(NETFLIX_EARNINGS)
+    return None
+
+
+def earnings_path(symbol, data_dir):
+    return os.path.join(data_dir, '{}_earnings.csv'.format(symbol))
+
+
+def input_paths(symbol, data_dir):
+    """The csv files a profile is drawn from, the earnings file only when it exists."""
+    paths = [
+        os.path.join(data_dir, '{}.csv'.format(symbol)),
+        os.path.join(data_dir, '{}_daily_by_quarter.csv'.format(symbol)),
+        os.path.join(data_dir, '{}.csv'.format(BENCHMARK)),
+    ]
+    if os.path.exists(earnings_path(symbol, data_dir)):
+        paths.append(earnings_path(symbol, data_dir))
+    return paths
+
+
+def load_profile_data(symbol, data_dir):
+    """Everything needed to draw one profile, as a dict of frames."""
+    prices_path, daily_path, benchmark_path = input_paths(symbol, data_dir)[:3]
+    return {
+        'symbol': symbol,
+        'prices': read_prices(prices_path),
+        'daily_quarter': read_prices(daily_path),
+        'benchmark': read_prices(benchmark_path),
+        'earnings': load_earnings(symbol, data_dir),
+    }
+
+
+def summarize_profile(data):
+    """The numbers behind the charts, for runs that don't need the charts themselves."""
+    prices = data['prices']
+    daily = data['daily_quarter']
+    return {
+        'symbol': data['symbol'],
+        'first_price': float(prices['Price'].iloc[0]),
+        'last_price': float(prices['Price'].iloc[-1]),
+        'growth_percentage': float(grow_percentage(prices).iloc[-1]),
+        'benchmark_growth_percentage': float(grow_percentage(data['benchmark']).iloc[-1]),
+        'quarter_mean_price': {quarter: float(price) for quarter, price in daily.groupby('Quarter')['Price'].mean().items()},
+    }
+
+
+def format_date_axis(ax):
+    """Let matplotlib pick the date ticks and labels for whatever span is plotted."""
+    import matplotlib.dates as mdates
+
+    locator = mdates.AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
+
+def grow_percentage(prices):
+    """Price as a percentage of the first price, to compare stocks with each other."""
+    return prices['Price'] / prices['Price'].iloc[0] * 100
+
+
+class ProfileCanvas:
+    """One Agg figure with a single and a side by side axes layout, reused for every chart.
+
+    save() only draws the chart; a FigureOutput writes the file on a thread
+    while the next chart is drawn, and wait() returns once all are written.
+    """
+
+    def __init__(self, output=None):
+        import matplotlib
+        matplotlib.use('Agg')
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        import seaborn as sns
+        from figure_output import FigureOutput
+
+        sns.set_theme(context='talk', style='whitegrid', palette='pastel')
+        self.figure = Figure()
+        FigureCanvasAgg(self.figure)
+        self.single = self.figure.add_subplot(1, 1, 1)
+        self.left = self.figure.add_subplot(1, 2, 1)
+        self.right = self.figure.add_subplot(1, 2, 2)
+        self.figure.subplots_adjust(wspace=0.5)
+        self.output = output or FigureOutput()
+
+    def axes(self, layout, figsize):
+        """Clear and return the axes for `layout`, hiding the axes of the other layout."""
+        self.figure.set_size_inches(figsize)
+        self.figure.suptitle('')
+        if layout == 'single':
+            used, unused = [self.single], [self.left, self.right]
+        else:
+            used, unused = [self.left, self.right], [self.single]
+        for ax in unused:
+            ax.set_visible(False)
+        for ax in used:
+            ax.clear()
+            ax.set_visible(True)
+        return used
+
+    def save(self, path):
+        self.output.save(self.figure, path)
+
+    def wait(self):
+        self.output.wait()
+
+
+def plot_violin(canvas, data):
+    import seaborn as sns
+
+    [ax] = canvas.axes('single', (15, 10))
+    sns.violinplot(data=data['daily_quarter'], x='Quarter', y='Price', order=QUARTERS, ax=ax)
+    ax.set_ylabel('Closing Stock Price')
+    ax.set_xlabel('Business Quarters')
+    ax.set_title('Distribution of {} Stock Prices by Quarter'.format(data['symbol']))
+
+
+def plot_kde(canvas, data):
+    import seaborn as sns
+
+    [ax] = canvas.axes('single', (15, 10))
+    daily = data['daily_quarter']
+    for quarter in QUARTERS:
+        sns.kdeplot(daily['Price'][daily['Quarter'] == quarter], fill=True, label=quarter, ax=ax)
+    ax.set_title('Distribution of {} Stock Prices by Quarter'.format(data['symbol']))
+    ax.legend()
+
+
+def plot_earnings_scatter(canvas, data):
+    [ax] = canvas.axes('single', (10, 8))
+    earnings = data['earnings']
+    x_positions = range(1, len(earnings) + 1)
+    ax.scatter(x_positions, earnings['EPS Actual'], color='red', alpha=0.5)
+    ax.scatter(x_positions, earnings['EPS Estimate'], color='blue', alpha=0.5)
+    ax.legend(['Actual', 'Estimate'])
+    ax.set_xticks(list(x_positions))
+    ax.set_xticklabels(earnings['Quarter'])
+    ax.set_title('Earnings Per Share in Cents')
+
+
+def plot_earnings_revenue(canvas, data):
+    [ax] = canvas.axes('single', (10, 10))
+    earnings = data['earnings']
+    #same bar layout as the notebook: 2 datasets, bars of width .5
+    t = 2
+    w = .5
+    bars1_x = [t * element + w * 1 for element in range(len(earnings))]
+    bars2_x = [t * element + w * 2 for element in range(len(earnings))]
+    ax.bar(bars1_x, earnings['Revenue'])
+    ax.bar(bars2_x, earnings['Earnings'])
+    middle_x = [(a + b) / 2.0 for a, b in zip(bars1_x, bars2_x)]
+    ax.legend(['Revenue', 'Earnings'])
+    ax.set_xticks(middle_x)
+    ax.set_xticklabels(earnings['Revenue Quarter'])
+    ax.set_title('Revenue and Earnings')
+
+
+def plot_percent_earnings(canvas, data):
+    import matplotlib.ticker as mtick
+
+    [ax] = canvas.axes('single', (10, 10))
+    earnings = data['earnings']
+    percentage = earnings['Earnings'] / earnings['Revenue'] * 100
+    ax.bar(range(len(percentage)), percentage)
+    ax.set_xticks(range(len(percentage)))
+    ax.set_xticklabels(earnings['Revenue Quarter'])
+    ax.set_title('Earnings in Percentage of Revenue per Quarter')
+    ax.set_ylabel('Percent')
+    ax.yaxis.set_major_formatter(mtick.PercentFormatter(decimals=0))
+    ax.set_xlabel('Quarter')
+
+
+def plot_stock_growth(canvas, data):
+    ax1, ax2 = canvas.axes('pair', (12, 6))
+    for ax, prices, title in [(ax1, data['prices'], data['symbol']), (ax2, data['benchmark'], 'Dow Jones')]:
+        ax.plot(prices['Date'], prices['Price'])
+        format_date_axis(ax)
+        ax.set_title(title)
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Stock Price')
+
+
+def plot_percentage_growth(canvas, data):
+    import matplotlib.ticker as mtick
+
+    [ax] = canvas.axes('single', (10, 8))
+    benchmark = data['benchmark']
+    prices = data['prices']
+    ax.plot(benchmark['Date'], grow_percentage(benchmark), label=BENCHMARK.lower())
+    ax.plot(prices['Date'], grow_percentage(prices), label=data['symbol'].lower())
+    ax.yaxis.set_major_formatter(mtick.PercentFormatter(decimals=0))
+    format_date_axis(ax)
+    ax.legend()
+    ax.set_title('Percentage growth of stock prices')
+    ax.set_ylabel('Percentage of Original')
+
+
+#filename -> (plot function, needs earnings)
+CHARTS = [
+    ('violinquarter.png', plot_violin, False),
+    ('kdequarter.png', plot_kde, False),
+    ('scatterearnings.png', plot_earnings_scatter, True),
+    ('earningsrevenue.png', plot_earnings_revenue, True),
+    ('percentearnings.png', plot_percent_earnings, True),
+    ('stockgrowth.png', plot_stock_growth, False),
+    ('percentage_growth.png', plot_percentage_growth, False),
+]
+
+#one canvas per worker process, created on first use
+_canvas = None
+
+
+def has_earnings(symbol, data_dir):
+    return os.path.exists(earnings_path(symbol, data_dir)) or symbol == 'NFLX'
+
+
+def output_paths(symbol, data_dir, out_dir):
+    """The chart files render_profile() writes for `symbol`."""
+    earnings = has_earnings(symbol, data_dir)
+    return [os.path.join(out_dir, symbol, filename)
+            for filename, plot, needs_earnings in CHARTS
+            if earnings or not needs_earnings]
+
+
+def profile_is_current(symbol, data_dir, out_dir):
+    """True when every chart of the profile exists and is newer than the csv files it is drawn from."""
+    outputs = output_paths(symbol, data_dir, out_dir)
+    if not all(os.path.exists(path) for path in outputs + input_paths(symbol, data_dir)):
+        return False
+    newest_input = max(os.path.getmtime(path) for path in input_paths(symbol, data_dir))
+    return min(os.path.getmtime(path) for path in outputs) >= newest_input
+
+
+def render_profile(symbol, data_dir, out_dir):
+    """Draw every chart of one profile into <out_dir>/<symbol>/ and return the written paths."""
+    global _canvas
+    if _canvas is None:
+        _canvas = ProfileCanvas()
+
+    with stage('load_profile_data'):
+        data = load_profile_data(symbol, data_dir)
+    symbol_dir = os.path.join(out_dir, symbol)
+    os.makedirs(symbol_dir, exist_ok=True)
+
+    written = []
+    for filename, plot, needs_earnings in CHARTS:
+        if needs_earnings and data['earnings'] is None:
+            continue
+        chart = os.path.splitext(filename)[0]
+        with stage(chart):
+            plot(_canvas, data)
+        path = os.path.join(symbol_dir, filename)
+        with stage('savefig_' + chart):
+            _canvas.save(path)
+        written.append(path)
+    with stage('write_charts'):
+        _canvas.wait()
+    #pool workers exit without running atexit, so write their stage report here
+    stage_timer.flush()
+    return written
+
+
+def render_profiles(symbols, data_dir='.', out_dir='profiles', workers=None, force=False):
+    """Render the profiles of all `symbols` in a process pool.
+
+    Returns ({symbol: [paths]}, {symbol: error message}); a symbol that fails,
+    like one without a csv file, doesn't stop the others. Profiles that are
+    already up to date are skipped unless `force` is set.
+    """
+    results = {}
+    errors = {}
+    outdated = []
+    for symbol in symbols:
+        if not force and profile_is_current(symbol, data_dir, out_dir):
+            results[symbol] = output_paths(symbol, data_dir, out_dir)
+        else:
+            outdated.append(symbol)
+
+    if outdated:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {symbol: pool.submit(render_profile, symbol, data_dir, out_dir) for symbol in outdated}
+            for symbol, future in futures.items():
+                try:
+                    results[symbol] = future.result()
+                except Exception as e:
+                    errors[symbol] = '{}: {}'.format(type(e).__name__, e)
+    return {symbol: results[symbol] for symbol in symbols if symbol in results}, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render a stock profile for every given ticker.')
+    parser.add_argument('symbols', nargs='+', help='ticker symbols, e.g. NFLX AAPL')
+    parser.add_argument('--data-dir', default='.', help='folder with the <SYMBOL>.csv files')
+    parser.add_argument('--out-dir', default='profiles', help='folder to write the profiles to')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--force', action='store_true', help='rebuild profiles that are already up to date')
+    parser.add_argument('--data-only', action='store_true', help='print the numbers, don\'t draw the charts')
+    args = parser.parse_args(argv)
+
+    if args.data_only:
+        failed = 0
+        for symbol in args.symbols:
+            try:
+                print(summarize_profile(load_profile_data(symbol, args.data_dir)))
+            except Exception as e:
+                print('{}: failed: {}: {}'.format(symbol, type(e).__name__, e))
+                failed += 1
+        return 1 if failed else 0
+
+    results, errors = render_profiles(args.symbols, args.data_dir, args.out_dir, args.workers, args.force)
+    for symbol in args.symbols:
+        if symbol in errors:
+            print('{}: failed: {}'.format(symbol, errors[symbol]))
+        else:
+            print('{}: {} charts in {}'.format(symbol, len(results[symbol]), os.path.join(args.out_dir, symbol)))
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())